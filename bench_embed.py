@@ -0,0 +1,113 @@
+# bench_embed.py
+"""
+Embed renderer benchmark: the old create_embed_image path (every asset loaded
+per call, PNG encoded on the event loop) vs. the preloaded renderer in each
+EMBED_FORMAT, running on its executor.
+
+Usage: python bench_embed.py [renders]
+
+For each variant it reports the per-render time, how long the event loop was
+blocked (a 1 ms heartbeat runs next to the renders; worst and total
+lateness, as in bench_storage.py), the bytes uploaded per job (the embed goes
+out twice: DM + channel) and how far the pixels are from the legacy output.
+"""
+import io
+import sys
+import time
+import asyncio
+import statistics
+from pathlib import Path
+
+from PIL import Image, ImageChops, ImageDraw, ImageFont, ImageStat
+
+from real_bot.utils import embed_image
+from real_bot.utils.embed_image import AVATAR_SIZE, AVATAR_POSITION, wrap_text, create_embed_image
+
+RENDERS = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+# Asset paths in the module are relative to the deploy dir; point them at this checkout
+ROOT = Path(__file__).resolve().parent / "real_bot"
+embed_image.TEMPLATE_PATH = str(ROOT / "emblem.png")
+embed_image.CHECKMARK_PATH = str(ROOT / "checkmark.png")
+embed_image.FONT_BOLD = str(ROOT / "utils" / "fonts" / "arialbd.ttf")
+embed_image.FONT_REGULAR = str(ROOT / "utils" / "fonts" / "arial.ttf")
+
+def legacy_render(user, avatar_bytes, title, elapsed):
+    """Same steps as the pre-cache create_embed_image."""
+    template = Image.open(embed_image.TEMPLATE_PATH).convert("RGBA")
+    title_font = ImageFont.truetype(embed_image.FONT_BOLD, 28)
+    sub_font = ImageFont.truetype(embed_image.FONT_REGULAR, 20)
+    footer_font = ImageFont.truetype(embed_image.FONT_BOLD, 28)
+    draw = ImageDraw.Draw(template)
+    avatar = Image.open(io.BytesIO(avatar_bytes)).convert("RGBA").resize(AVATAR_SIZE)
+    mask = Image.new("L", AVATAR_SIZE, 0)
+    ImageDraw.Draw(mask).ellipse((0, 0, *AVATAR_SIZE), fill=255)
+    template.paste(avatar, AVATAR_POSITION, mask)
+    y = 180
+    for line in wrap_text(title, title_font, 470):
+        draw.text((380, y), line, font=title_font, fill="white")
+        y += title_font.size + 8
+    checkmark = Image.open(embed_image.CHECKMARK_PATH).convert("RGBA").resize((42, 42))
+    template.paste(checkmark, (330, 180), checkmark)
+    if elapsed:
+        draw.text((320, y + 10), f"Downloaded in {elapsed:.2f}s", font=sub_font, fill="white")
+    draw.text((100, 400), f"Requested by {user}", font=footer_font, fill="white")
+    buf = io.BytesIO()
+    template.save(buf, format="PNG")
+    buf.seek(0)
+    return buf
+
+async def run(name, render):
+    lag_max, lag_total, stop = 0.0, 0.0, False
+
+    async def heartbeat():
+        nonlocal lag_max, lag_total
+        while not stop:
+            t = time.perf_counter()
+            await asyncio.sleep(0.001)
+            late = time.perf_counter() - t - 0.001
+            lag_max = max(lag_max, late)
+            lag_total += max(0.0, late)
+
+    hb = asyncio.create_task(heartbeat())
+    await asyncio.sleep(0.01)
+    times = []
+    for _ in range(RENDERS):
+        t = time.perf_counter()
+        out = await render()
+        times.append(time.perf_counter() - t)
+        await asyncio.sleep(0.002)  # let the heartbeat tick between renders
+    stop = True
+    await hb
+    size = len(out.getvalue())
+    print(
+        f"{name:<8} median {statistics.median(times) * 1000:7.2f} ms | loop blocked max {lag_max * 1000:7.2f} ms,"
+        f" total {lag_total / RENDERS * 1000:7.2f} ms/render | {size * 2 / 1024:7.1f} KiB uploaded/job"
+    )
+    return out
+
+def pixel_diff(a, b) -> float:
+    """Mean absolute difference per channel, 0 = identical."""
+    stat = ImageStat.Stat(ImageChops.difference(Image.open(a).convert("RGBA"), Image.open(b).convert("RGBA")))
+    return sum(stat.mean) / len(stat.mean)
+
+async def main():
+    buf = io.BytesIO()
+    Image.new("RGB", (1024, 1024), (200, 60, 60)).save(buf, format="PNG")
+    avatar = buf.getvalue()
+    args = ("someone#0001", avatar, "Successfully downloaded reel!", 3.21)
+
+    async def legacy():
+        return legacy_render(*args)  # synchronous, on the loop, like the old coroutine
+
+    async def cached():
+        return await create_embed_image(*args, timestamp=None, mode="reel")
+
+    reference = await run("legacy", legacy)
+    for fmt in ("png", "webp", "png8"):
+        embed_image.EMBED_FORMAT = fmt
+        out = await run(fmt, cached)
+        print(f"{'':<8} pixel diff vs legacy: {pixel_diff(reference, out):.3f}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,71 @@
+# bench_storage.py
+"""
+Config-write benchmark: full-file rewrite per write (the old storage._save path)
+vs. the journaled JsonStore with group commit.
+
+Usage: python bench_storage.py [writes] [guilds]
+
+For each mode it reports write throughput and how long the event loop was
+blocked: a 1 ms heartbeat task runs next to a coroutine issuing the writes,
+and we record the worst and total lateness of the heartbeat.
+"""
+import sys
+import json
+import time
+import asyncio
+import tempfile
+from pathlib import Path
+
+from real_bot.storage import JsonStore
+
+WRITES = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+GUILDS = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+
+def legacy_writer(path: Path):
+    """Same read-modify-write as the pre-journal storage.set_channel_id."""
+    def write(gid: int, cid: int):
+        data = json.loads(path.read_text(encoding="utf-8") or "{}")
+        data[str(gid)] = {"channel_id": cid}
+        path.write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding="utf-8")
+    return write
+
+async def run(name: str, write, finish=lambda: None):
+    lag_max, lag_total, stop = 0.0, 0.0, False
+
+    async def heartbeat():
+        nonlocal lag_max, lag_total
+        while not stop:
+            t = time.perf_counter()
+            await asyncio.sleep(0.001)
+            late = time.perf_counter() - t - 0.001
+            lag_max = max(lag_max, late)
+            lag_total += max(0.0, late)
+
+    hb = asyncio.create_task(heartbeat())
+    await asyncio.sleep(0.01)
+    t0 = time.perf_counter()
+    for i in range(WRITES):
+        write(i % GUILDS, 10_000 + i)
+        if i % 10 == 0:
+            await asyncio.sleep(0)  # like separate commands arriving on the loop
+    on_loop = time.perf_counter() - t0
+    finish()
+    durable = time.perf_counter() - t0
+    stop = True
+    await hb
+    print(f"{name:<10} {WRITES / durable:>10.0f} writes/s   on-loop {on_loop * 1000:>8.1f} ms"
+          f"   heartbeat lag max {lag_max * 1000:>6.2f} ms  total {lag_total * 1000:>8.1f} ms")
+
+async def main():
+    print(f"{WRITES} writes over {GUILDS} guilds")
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy = Path(tmp) / "legacy.json"
+        legacy.write_text("{}", encoding="utf-8")
+        await run("rewrite", legacy_writer(legacy))
+
+        store = JsonStore(Path(tmp) / "guilds.json")
+        await run("journal", store.set, finish=store.flush)
+        store.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,273 @@
+# real_bot/cogs/batch_downloader.py
+
+import os
+import time
+import shutil
+import tempfile
+import asyncio
+import discord
+import traceback
+from discord.ext import commands
+from urllib.parse import urlparse
+
+from real_bot.utils.embed_image import create_embed_image, embed_filename
+from real_bot.utils.downloader import QuietLogger, expand_playlist, media_key
+from real_bot.utils.fetch import (
+    REEL_FORMAT, SHORT_FORMAT, AUDIO_FORMAT, INSTAGRAM_COOKIES, YOUTUBE_COOKIES,
+    ProbeFailed, TooLong, fetch_video, fetch_music, job_key,
+)
+from real_bot.utils.singleflight import DOWNLOADS
+from real_bot.utils.limits import TooLarge, EXACT_HEADROOM, upload_limit
+from real_bot.utils.progress import StatusEditor, watch
+from real_bot.utils.delivery import deliver, delete_invocation, delete_quietly, fetch_avatar
+from real_bot.utils.batch import BATCH_MAX_ITEMS, BATCH_CONCURRENCY, BATCH_MAX_DURATION, ZipParts, is_playlist_url, dedupe
+
+# ✅ Local JSON storage helpers
+from real_bot.storage import ensure_storage, get_channel_id as get_channel_id_json
+
+# --- Config ---
+INVITE_LINK = (
+    "https://discord.com/oauth2/authorize?client_id=1398552886182412329"
+    "&scope=bot+applications.commands&permissions=8"
+)
+
+class InviteButton(discord.ui.View):
+    def __init__(self):
+        super().__init__()
+        self.add_item(discord.ui.Button(label="➕ Invite Bot", url=INVITE_LINK))
+
+def _video_profile(url: str):
+    """(format, cookie file, max duration) for a video URL, as its single-item command uses.
+
+    Full YouTube videos (anything but a /shorts/ link, playlist items too)
+    get the Shorts profile capped at BATCH_MAX_DURATION.
+    """
+    if (media_key(url) or "").startswith("instagram:"):
+        return REEL_FORMAT, INSTAGRAM_COOKIES, None
+    if urlparse(url).path.startswith("/shorts/"):
+        return SHORT_FORMAT, YOUTUBE_COOKIES, None
+    return SHORT_FORMAT, YOUTUBE_COOKIES, BATCH_MAX_DURATION
+
+def _describe_error(e: BaseException) -> str:
+    if isinstance(e, TooLarge):
+        return f"too large to send (limit {e.limit // (1024 * 1024)} MB)"
+    if isinstance(e, TooLong):
+        return f"longer than {e.limit // 60} minutes"
+    if isinstance(e, ProbeFailed):
+        return "couldn't retrieve video info"
+    return "download failed"
+
+class BatchDownloader(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        ensure_storage()  # make sure JSON files exist
+
+    def _allowed_channel_id(self, guild_id: int):
+        cid = get_channel_id_json(guild_id)
+        return int(cid) if cid is not None else None
+
+    @commands.command(name="batch")
+    @commands.cooldown(1, 10, commands.BucketType.user)
+    async def batch(self, ctx, *urls: str):
+        """
+        Download several videos (or their audio) in one go, zipped.
+        Usage: !batch [audio] <URL> [URL…]  (YouTube videos/Shorts/playlists, Instagram Reels)
+        """
+        # Remove the command in the background; nothing waits on it
+        delete_invocation(ctx)
+        print(f"[DEBUG][Batch] User {ctx.author.id} invoked !batch with {len(urls)} args")
+
+        # Channel restriction (JSON storage)
+        if ctx.guild:
+            allowed_id = self._allowed_channel_id(ctx.guild.id)
+            if allowed_id is None or ctx.channel.id != allowed_id:
+                correct = ctx.guild.get_channel(allowed_id) if allowed_id else None
+                if correct:
+                    return await ctx.send(f"❌ Wrong channel — please use {correct.mention}")
+                return await ctx.send("❌ Download channel not configured. Use `!setup #channel`.")
+
+        urls = [u.strip("<>") for u in urls]
+        audio = bool(urls) and urls[0].lower() in ("audio", "music")
+        if urls and urls[0].lower() in ("audio", "music", "video"):
+            urls = urls[1:]
+        playlists = [u for u in urls if is_playlist_url(u)]
+        singles = [u for u in urls if u not in playlists and media_key(u)]
+        if audio:
+            singles = [u for u in singles if media_key(u).startswith("youtube:")]
+        skipped = [u for u in urls if u not in playlists and u not in singles]
+        if not playlists and not singles:
+            return await ctx.send("❌ Please give YouTube or Instagram Reel links (or a YouTube playlist).")
+
+        label = "🔄 Downloading audio…" if audio else "🔄 Downloading videos…"
+        # Embed avatar (past the gates): cached, or fetched from now on while the job runs
+        avatar = fetch_avatar(ctx.author)
+        status = await ctx.send(label)
+        progress = StatusEditor(status, label)
+        start_time = time.time()
+        job_dir = tempfile.mkdtemp(prefix="batch_zip_")
+        flights = []
+        tasks = []
+        sender = None
+        unread = []  # playlists whose listing failed
+
+        try:
+            # --- Playlists: one flat extraction each, capped for the whole batch ---
+            items = dedupe(singles)
+            for playlist in playlists:
+                room = BATCH_MAX_ITEMS - len(items)
+                if room <= 0:
+                    break
+                progress.set("📜 Reading playlist…")
+                try:
+                    entries = await expand_playlist(playlist, {
+                        'quiet': True, 'no_warnings': True, 'cookiefile': YOUTUBE_COOKIES, 'logger': QuietLogger(),
+                    }, room)
+                except Exception as e:
+                    print(f"[DEBUG][Batch] Playlist expansion failed for {playlist!r}: {e!r}")
+                    unread.append(playlist)
+                    continue
+                items = dedupe(items + entries)
+            dropped = max(0, len(items) - BATCH_MAX_ITEMS)
+            items = items[:BATCH_MAX_ITEMS]
+            if not items:
+                return await progress.finish("❌ Nothing to download in those links.")
+
+            # --- Items: concurrently, within the batch's budget ---
+            job_guild = ctx.guild.id if ctx.guild else ctx.author.id
+            limit = upload_limit(None)  # everything goes to the user's DMs
+            budget = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+            async def one(url):
+                """(url, flight or None, seconds, error or None) for one item."""
+                t0 = time.time()
+                if audio:
+                    key = job_key(url, AUDIO_FORMAT, limit)
+                    fetch = lambda: fetch_music(url, limit, job_guild, ctx.author.id, per_user=BATCH_CONCURRENCY)
+                else:
+                    fmt, cookies, max_duration = _video_profile(url)
+                    key = job_key(url, fmt, limit)
+                    # Not re-encoded: an item that doesn't fit is reported
+                    fetch = lambda: fetch_video(
+                        url, fmt, cookies, limit, job_guild, ctx.author.id, refit=False,
+                        per_user=BATCH_CONCURRENCY, max_duration=max_duration, tag="Batch",
+                    )
+                try:
+                    async with budget:
+                        # Shares a running !reel/!short/!music job for the same media;
+                        # its live progress shows in the batch's status
+                        with watch(key, progress):
+                            flight = await DOWNLOADS.join(key, fetch)
+                except Exception as e:
+                    if not isinstance(e, (TooLarge, TooLong, ProbeFailed)):
+                        print(f"[ERROR][Batch] {url!r} failed: {e!r}")
+                    return url, None, time.time() - t0, e
+                flights.append(flight)
+                return url, flight, time.time() - t0, None
+
+            tasks = [asyncio.ensure_future(one(u)) for u in items]
+            zips = ZipParts(job_dir, "music" if audio else "videos", limit - EXACT_HEADROOM)
+            lines, done, dm = [], 0, {"open": True}
+            # Item progress renders after the count: "🔄 Downloading videos… 2/5 done ▰▰▱… 40%"
+            progress.label = f"{label} 0/{len(items)} done"
+            progress.set(progress.label)
+
+            # Full parts upload in the background, in order, while zipping goes on
+            parts = asyncio.Queue()
+
+            async def send_parts():
+                while (part := await parts.get()) is not None:
+                    if not dm["open"]:
+                        continue
+                    try:
+                        await ctx.author.send(file=discord.File(part))
+                    except discord.Forbidden:
+                        print("[WARNING][Batch] Could not DM zip part.")
+                        dm["open"] = False
+                    except discord.HTTPException as e:
+                        print(f"[WARNING][Batch] Zip part upload failed: {e!r}")
+
+            sender = asyncio.ensure_future(send_parts())
+
+            # --- Zip each item as it lands; send full parts right away ---
+            for next_done in asyncio.as_completed(tasks):
+                url, flight, took, err = await next_done
+                if err is not None:
+                    lines.append(f"❌ `{url}`: {_describe_error(err)}")
+                else:
+                    path = flight.result
+                    if path and os.path.exists(path):
+                        try:
+                            part = await zips.add(path)
+                        except TooLarge as e:
+                            lines.append(f"❌ `{url}`: {_describe_error(e)}")
+                        else:
+                            done += 1
+                            lines.append(f"✅ `{os.path.basename(path)}` in {took:.1f}s")
+                            if part:
+                                parts.put_nowait(part)
+                    else:
+                        lines.append(f"❌ `{url}`: file not found after download")
+                    flight.release()  # zipped: the job's files may go
+                progress.label = f"{label} {len(lines)}/{len(items)} done"
+                progress.set(progress.label)
+
+            last_part = await zips.close()
+            parts.put_nowait(None)
+            await sender  # earlier parts go out before the last one
+            elapsed = time.time() - start_time
+            print(f"[DEBUG][Batch] {done}/{len(items)} items in {elapsed:.2f}s, {zips.parts} zip part(s)")
+            if not done:
+                return await progress.finish("❌ None of the links could be downloaded.")
+
+            lines += [f"⏭️ `{u}`: not a supported link" for u in skipped]
+            lines += [f"❌ `{u}`: couldn't read the playlist" for u in unread]
+            if dropped:
+                lines.append(f"⏭️ {dropped} more item(s) over the {BATCH_MAX_ITEMS}-item limit")
+            lines.append(f"⏱️ Total: {elapsed:.2f}s · {zips.parts} zip part(s)")
+            summary = "\n".join(lines)
+            if len(summary) > 2000:
+                summary = f"✅ {done}/{len(items)} downloaded · ⏱️ Total: {elapsed:.2f}s · {zips.parts} zip part(s)"
+
+            # Build embed (BytesIO or path; timestamp ignored by renderer)
+            try:
+                image_obj = await create_embed_image(
+                    user=ctx.author,
+                    avatar_bytes=b"",
+                    avatar_image=await avatar,
+                    title=f"{done} of {len(items)} downloaded!",
+                    elapsed=elapsed,
+                    timestamp=None,
+                    mode="music" if audio else "short"
+                )
+            except Exception:
+                print(f"[ERROR][Batch] create_embed_image failed:\n{traceback.format_exc()}")
+                image_obj = None
+
+            # Last zip part + summary + embed DM, channel embed: concurrently
+            await deliver(
+                ctx, tag="Batch", media=last_part if dm["open"] else None, content=summary,
+                image=image_obj, image_name=embed_filename("batch"), view_factory=InviteButton,
+            )
+
+            progress.close()
+            delete_quietly(status)
+
+        except Exception:
+            print(f"[ERROR][Batch] Unexpected error:\n{traceback.format_exc()}")
+            await progress.finish("❌ Failed to download the batch. Please try again later.")
+        finally:
+            for task in tasks:
+                task.cancel()  # gave up early: drop our place in the remaining jobs
+            if sender is not None and not sender.done():
+                sender.cancel()
+            for flight in flights:
+                flight.release()
+            shutil.rmtree(job_dir, ignore_errors=True)
+
+    @batch.error
+    async def batch_error(self, ctx, error):
+        if isinstance(error, commands.CommandOnCooldown):
+            await ctx.send(f"⏳ Please wait `{round(error.retry_after, 1)}s` before using this command again.")
+
+async def setup(bot):
+    await bot.add_cog(BatchDownloader(bot))
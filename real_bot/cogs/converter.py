@@ -1,24 +1,32 @@
 # real_bot/cogs/converter.py
 
 import os
-import io
 import time
+import shutil
+import asyncio
+import zipfile
+import tempfile
 import traceback
-from PIL import Image
 import discord
 from discord.ext import commands
 
-from real_bot.utils.embed_image import create_embed_image
+from real_bot.utils.embed_image import create_embed_image, embed_filename
+from real_bot.utils.delivery import deliver, delete_invocation, delete_quietly, fetch_avatar, fits_one_message
+from real_bot.utils import image_convert
+from real_bot.utils.image_convert import HEIF, TARGETS, convert_batch, source_format
 from real_bot.storage import ensure_storage, get_channel_id
 
-DOWNLOAD_PATH = "real_bot/real_bot/downloads"
-os.makedirs(DOWNLOAD_PATH, exist_ok=True)
-
 INVITE_LINK = (
     "https://discord.com/oauth2/authorize?client_id=1398552886182412329"
     "&scope=bot+applications.commands&permissions=8"
 )
 
+def _zip(paths, zip_path: str) -> None:
+    # PNG/WebP are compressed already: store, don't deflate
+    with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_STORED) as zf:
+        for path in paths:
+            zf.write(path, arcname=os.path.basename(path))
+
 class InviteButton(discord.ui.View):
     def __init__(self):
         super().__init__()
@@ -29,19 +37,19 @@ class ConverterCog(commands.Cog):
         self.bot = bot
         ensure_storage()  # make sure JSON files exist
 
+    async def cog_unload(self):
+        # Shared CDN session for attachment downloads
+        await image_convert.close()
+
     @commands.command(name="convert")
     @commands.cooldown(1, 10, commands.BucketType.user)
-    async def convert(self, ctx):
+    async def convert(self, ctx, target: str = "png"):
         """
-        Convert a JPEG image to PNG.
-        Usage: `!convert` (attach a .jpg/.jpeg file to the message)
+        Convert every attached JPEG/WebP/HEIF image to PNG (default) or WebP.
+        Usage: `!convert [png|webp]` (attach up to 10 images to the message)
         """
-        # Attempt to delete invoking message if bot has permission
-        if ctx.guild and ctx.channel.permissions_for(ctx.guild.me).manage_messages:
-            try:
-                await ctx.message.delete()
-            except discord.Forbidden:
-                pass
+        # Remove the command in the background; nothing waits on it
+        delete_invocation(ctx)
 
         # Channel restriction (from local JSON store)
         if ctx.guild:
@@ -57,46 +65,70 @@ class ConverterCog(commands.Cog):
                     return await ctx.send(f"❌ Wrong channel — please use {correct.mention}")
                 return await ctx.send("❌ Download channel not configured. Use `!setup #channel`.")
 
+        target = target.lower().lstrip(".")
+        if target not in TARGETS:
+            return await ctx.send(f"❌ Unknown format `{target}`. Use `!convert png` or `!convert webp`.")
+
         # Ensure there's an attachment
         if not ctx.message.attachments:
-            return await ctx.send("📎 Please attach a JPEG image to convert.")
-
-        attachment = ctx.message.attachments[0]
+            return await ctx.send("📎 Please attach the images to convert.")
 
         # Accept by extension OR content type
-        is_jpeg_ext = attachment.filename.lower().endswith((".jpeg", ".jpg"))
-        is_jpeg_ct = (attachment.content_type or "").lower().startswith("image/jpeg")
-        if not (is_jpeg_ext or is_jpeg_ct):
-            return await ctx.send("❌ Only JPEG images are supported. Please use a .jpg or .jpeg file.")
-
-        status = await ctx.send("🔄 Converting image to PNG...")
+        attachments = [a for a in ctx.message.attachments if source_format(a)]
+        skipped = [a.filename for a in ctx.message.attachments if not source_format(a)]
+        if not attachments:
+            kinds = "JPEG, WebP or HEIF" if HEIF else "JPEG or WebP"
+            return await ctx.send(f"❌ Only {kinds} images are supported.")
+
+        label = target.upper()
+        count = f"{len(attachments)} images" if len(attachments) > 1 else "image"
+        # Embed avatar (past the gates): cached, or fetched from now on while the job runs
+        avatar = fetch_avatar(ctx.author)
+        status = await ctx.send(f"🔄 Converting {count} to {label}...")
         start_time = time.perf_counter()
+        # Per-job scratch dir: cleanup can't touch other jobs' files
+        job_dir = tempfile.mkdtemp(prefix="convert_")
 
         try:
             async with ctx.typing():
-                data = await attachment.read()
-                img = Image.open(io.BytesIO(data)).convert("RGB")
-
-                png_buffer = io.BytesIO()
-                img.save(png_buffer, format="PNG")
-                png_buffer.seek(0)
-
+                # Fetched concurrently, decoded + encoded in the convert process pool
+                results = await convert_batch(attachments, job_dir, target)
                 elapsed = time.perf_counter() - start_time
-                print(f"[DEBUG][Convert] Converted {attachment.filename} in {elapsed:.2f}s")
-
-                # Read avatar as PNG
-                try:
-                    avatar_bytes = await ctx.author.display_avatar.with_format('png').read()
-                except Exception as av_err:
-                    print(f"[DEBUG][Convert] avatar.read() failed: {av_err!r}")
-                    avatar_bytes = b""
+                done = [path for _, path, _, _ in results if path]
+                print(f"[DEBUG][Convert] {len(done)}/{len(results)} converted to {label} in {elapsed:.2f}s")
+
+                if not done:
+                    errors = {err for _, _, _, err in results}
+                    return await ctx.send(f"❌ {errors.pop() if len(errors) == 1 else 'None of the images could be converted.'}")
+
+                # One file as is; several in one message when they fit, else one zip
+                media = done[0] if len(done) == 1 else done
+                if len(done) > 1 and not fits_one_message(done):
+                    zip_path = os.path.join(job_dir, "converted.zip")
+                    await asyncio.to_thread(_zip, done, zip_path)
+                    if fits_one_message(zip_path):
+                        media = zip_path
+
+                lines = [
+                    f"✅ `{a.filename}` → `{os.path.basename(path)}` in {took:.2f}s" if path
+                    else f"❌ `{a.filename}`: {err}"
+                    for a, path, took, err in results
+                ]
+                lines += [f"⏭️ `{name}`: not a supported image" for name in skipped]
+                lines.append(f"⏱️ Total: {elapsed:.2f}s")
+                summary = "\n".join(lines)
+                if len(summary) > 2000:
+                    summary = f"✅ {len(done)}/{len(results)} converted · ⏱️ Total: {elapsed:.2f}s"
 
                 # Build the embed image (returns BytesIO)
                 try:
+                    title = (f"Your image was successfully converted to {label}" if len(done) == 1
+                             else f"{len(done)} images were successfully converted to {label}")
                     embed_io = await create_embed_image(
                         user=ctx.author,
-                        avatar_bytes=avatar_bytes,
-                        title="Your image was successfully converted to PNG",
+                        avatar_bytes=b"",
+                        avatar_image=await avatar,
+                        title=title,
                         elapsed=elapsed,
                         timestamp=None,   # renderer ignores timestamp now
                         mode="convert"
@@ -105,28 +137,12 @@ class ConverterCog(commands.Cog):
                     print(f"[ERROR][Convert] create_embed_image failed:\n{traceback.format_exc()}")
                     embed_io = None
 
-                # DM the converted image and the embed
-                try:
-                    await ctx.author.send(file=discord.File(png_buffer, filename="converted.png"))
-                    if embed_io:
-                        try:
-                            embed_io.seek(0)
-                        except Exception:
-                            pass
-                        await ctx.author.send(
-                            file=discord.File(embed_io, filename="embed.png"),
-                            view=InviteButton()
-                        )
-                except discord.Forbidden:
-                    print("[WARNING][Convert] Unable to DM user, skipping.")
-
-                # Send embed in channel
-                if embed_io:
-                    try:
-                        embed_io.seek(0)
-                    except Exception:
-                        pass
-                    await ctx.send(file=discord.File(embed_io, filename="embed.png"), view=InviteButton())
+                # Converted images + embed DM, channel embed: concurrently
+                await deliver(
+                    ctx, tag="Convert", media=media, media_name=os.path.basename(done[0]),
+                    image=embed_io, image_name=embed_filename("embed"), view_factory=InviteButton,
+                    content=summary,
+                )
 
         except Exception:
             print(f"[ERROR][Convert] Unexpected failure:\n{traceback.format_exc()}")
@@ -136,15 +152,10 @@ class ConverterCog(commands.Cog):
             # Delete status message if bot has permission
             try:
                 if 'status' in locals() and status and ctx.channel.permissions_for(ctx.guild.me).manage_messages:
-                    await status.delete()
+                    delete_quietly(status)
             except Exception:
                 pass
-            # Cleanup (nothing created on disk here, but keep sweep in case)
-            for f in os.listdir(DOWNLOAD_PATH):
-                try:
-                    os.remove(os.path.join(DOWNLOAD_PATH, f))
-                except:
-                    pass
+            shutil.rmtree(job_dir, ignore_errors=True)
 
     @convert.error
     async def convert_error(self, ctx, error):
@@ -10,7 +10,8 @@ class HelpCog(commands.Cog):
             "music":      "!music <YouTube URL>  – Download audio as MP3 (max 6m)",
             "reel":       "!reel <Instagram Reel URL>  – Download a reel video",
             "short":      "!short <YouTube Shorts URL>  – Download a Shorts video",
-            "convert":    "!convert <.jpg attachment>  – Convert JPEG→PNG",
+            "batch":      "!batch [audio] <URLs or playlist>  – Download several at once, zipped",
+            "convert":    "!convert [png|webp] <images>  – Convert JPEG/WebP/HEIF→PNG or WebP",
             # …add the rest…
         }
 
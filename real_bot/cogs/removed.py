@@ -1,33 +1,11 @@
 # real_bot/cogs/removed.py
 
-import os
 import re
-import json
 import discord
 from discord.ext import commands
 
-STORAGE_DIR = os.getenv("STORAGE_DIR", "real_bot/data")
-GUILDS_JSON = os.path.join(STORAGE_DIR, "guilds.json")
-
-def _ensure_storage():
-    os.makedirs(STORAGE_DIR, exist_ok=True)
-    if not os.path.exists(GUILDS_JSON):
-        with open(GUILDS_JSON, "w", encoding="utf-8") as f:
-            json.dump({}, f)
-
-def _load_guild_map() -> dict:
-    _ensure_storage()
-    try:
-        with open(GUILDS_JSON, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        return data if isinstance(data, dict) else {}
-    except Exception:
-        return {}
-
-def _save_guild_map(data: dict) -> None:
-    _ensure_storage()
-    with open(GUILDS_JSON, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+# ✅ Shared storage (JSON or SQLite backend)
+from real_bot.storage import ensure_storage, mapping_count, delete_by_guild, delete_by_channel
 
 def _extract_digits(s: str) -> str:
     # Pull out the first long number (works with mentions like <#123...>)
@@ -49,9 +27,8 @@ class RemoveDB(commands.Cog):
           - !removedb 123456789012345678   (channel ID)
           - !removedb guild:987654321098765432  (guild ID)
         """
-        _ensure_storage()
-        guild_map = _load_guild_map()
-        if not guild_map:
+        ensure_storage()
+        if not mapping_count():
             return await ctx.send("📭 No stored mappings found.")
 
         ident = ident.strip()
@@ -60,20 +37,15 @@ class RemoveDB(commands.Cog):
         # Support "guild:<id>" to remove a mapping by guild ID
         if ident.lower().startswith("guild:"):
             gid = _extract_digits(ident)
-            if gid and gid in guild_map:
-                del guild_map[gid]
+            if gid and delete_by_guild(int(gid)):
                 deleted_keys.append(gid)
         else:
             # Otherwise treat as channel mention/ID and remove any guilds pointing to it
             ch_id = _extract_digits(ident)
             if ch_id:
-                to_delete = [gid for gid, saved_ch in guild_map.items() if str(saved_ch) == ch_id]
-                for gid in to_delete:
-                    del guild_map[gid]
-                deleted_keys.extend(to_delete)
+                deleted_keys.extend(str(gid) for gid in delete_by_channel(int(ch_id)))
 
         if deleted_keys:
-            _save_guild_map(guild_map)
             await ctx.send(f"🗑️ Removed {len(deleted_keys)} mapping(s): `{', '.join(deleted_keys)}`.")
         else:
             await ctx.send("❌ Nothing matched. Provide a valid channel mention/ID or `guild:<id>`.")
@@ -2,17 +2,20 @@
 
 import os
 import time
-import shutil
-import tempfile
 import asyncio
 import discord
 import traceback
-import yt_dlp
 from discord.ext import commands
 from urllib.parse import urlparse
 from discord.ext.commands import Converter, BadArgument
 
-from real_bot.utils.embed_image import create_embed_image
+from real_bot.utils.embed_image import create_embed_image, embed_filename
+from real_bot.utils.fetch import SHORT_FORMAT, YOUTUBE_COOKIES, fetch_video, job_key
+from real_bot.utils.singleflight import DOWNLOADS
+from real_bot.utils.streaming import StreamTap, send_while_downloading, STREAM_MAX_BYTES
+from real_bot.utils.limits import TooLarge, upload_limit
+from real_bot.utils.progress import StatusEditor, watch
+from real_bot.utils.delivery import deliver, delete_invocation, delete_quietly, fetch_avatar
 
 
 # ✅ Local JSON storage helpers
@@ -38,22 +41,12 @@ INVITE_LINK = (
     "https://discord.com/oauth2/authorize?client_id=1398552886182412329"
     "&scope=bot+applications.commands&permissions=8"
 )
-COOKIE_FILE = "real_bot/real_bot/cookies_youtube.txt"
-FFMPEG_PATH = os.getenv("FFMPEG_PATH")  # optional
-
-# Limit concurrent downloads (env MAX_CONCURRENT, default 2)
-SHORT_SEMAPHORE = asyncio.Semaphore(int(os.getenv("MAX_CONCURRENT", "2")))
 
 class InviteButton(discord.ui.View):
     def __init__(self):
         super().__init__()
         self.add_item(discord.ui.Button(label="➕ Invite Bot", url=INVITE_LINK))
 
-class QuietLogger:
-    def debug(self, msg): pass
-    def warning(self, msg): pass
-    def error(self, msg): pass
-
 class ShortDownloader(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
@@ -70,14 +63,8 @@ class ShortDownloader(commands.Cog):
         Download a YouTube Shorts video.
         Usage: !short <YouTube Shorts URL>
         """
-        # Attempt to delete invoking message if bot has permission
-        if ctx.guild and ctx.channel.permissions_for(ctx.guild.me).manage_messages:
-            try:
-                await ctx.message.delete()
-            except discord.Forbidden:
-                pass
-
-        status = await ctx.send("⏳ Waiting…")
+        # Remove the command in the background; nothing waits on it
+        delete_invocation(ctx)
         print(f"[DEBUG][Short] User {ctx.author.id} invoked !short with URL: {url!r}")
 
         # Channel restriction (JSON storage)
@@ -86,52 +73,59 @@ class ShortDownloader(commands.Cog):
             if allowed_id is None or ctx.channel.id != allowed_id:
                 correct = ctx.guild.get_channel(allowed_id) if allowed_id else None
                 if correct:
-                    return await status.edit(content=f"❌ Wrong channel — please use {correct.mention}")
-                return await status.edit(content="❌ Download channel not configured. Use `!setup #channel`.")
-
-        # Unique per-job directory
-        job_dir = tempfile.mkdtemp(prefix="short_")
-        await status.edit(content="🔄 Downloading YouTube Short…")
+                    return await ctx.send(f"❌ Wrong channel — please use {correct.mention}")
+                return await ctx.send("❌ Download channel not configured. Use `!setup #channel`.")
+
+        # Embed avatar (past the gates): cached, or fetched from now on while the job runs
+        avatar = fetch_avatar(ctx.author)
+        status = await ctx.send("🔄 Downloading YouTube Short…")
+        # "#N in line", then live percent / speed / ETA, coalesced into few edits
+        progress = StatusEditor(status, "🔄 Downloading YouTube Short…")
         start_time = time.time()
+        flight = None
+        job = None
 
         try:
-            ydl_opts = {
-                'format': 'mp4',
-                'outtmpl': os.path.join(job_dir, "%(title).80B.%(ext)s"),
-                'quiet': True,
-                'no_warnings': True,
-                'cookiefile': COOKIE_FILE,
-                'logger': QuietLogger(),
-            }
-            if FFMPEG_PATH:
-                ydl_opts['ffmpeg_location'] = FFMPEG_PATH
-
-            # Run heavy work off the event loop + concurrency cap
-            async with SHORT_SEMAPHORE:
-                def _run_dl():
-                    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                        info = ydl.extract_info(url, download=True)
-                        return ydl.prepare_filename(info)
-                filename = await asyncio.to_thread(_run_dl)
+            # Only ask for formats we can deliver (the file goes to the user's DMs)
+            limit = upload_limit(None)
+            # Already downloaded this exact media/format? Upload straight from the cache.
+            media_cache_key = job_key(url, SHORT_FORMAT, limit)
+            # Fair-queue bucket (DMs queue per user)
+            job_guild = ctx.guild.id if ctx.guild else ctx.author.id
+            # Lets the DM upload start while the file is still downloading
+            tap = StreamTap(max_bytes=min(STREAM_MAX_BYTES, limit))
+            fetch = lambda: fetch_video(
+                url, SHORT_FORMAT, YOUTUBE_COOKIES, limit, job_guild, ctx.author.id, tap, progress, tag="Short",
+            )
+
+            with watch(media_cache_key, progress):
+                # The same link requested concurrently (any URL variant) shares one download
+                job = asyncio.ensure_future(DOWNLOADS.join(media_cache_key, fetch))
+
+                # DM video: streamed during the download when possible, else sent below
+                try:
+                    streamed = await send_while_downloading(
+                        tap, job,
+                        lambda fp: ctx.author.send(file=discord.File(fp, filename=os.path.basename(fp.name))),
+                    )
+                except discord.Forbidden:
+                    print("[WARNING][Short] Could not DM video file.")
+                    streamed = True
+                flight = await job
+            filename = flight.result
 
             elapsed = time.time() - start_time
-            print(f"[DEBUG][Short] Downloaded to {filename!r} in {elapsed:.2f}s")
+            print(f"[DEBUG][Short] Downloaded to {filename!r} in {elapsed:.2f}s (job shared by {flight.shared_with})")
 
             if not os.path.exists(filename):
-                return await status.edit(content="❌ Download failed: file not created.")
-
-            # Read avatar as PNG
-            try:
-                avatar_bytes = await ctx.author.display_avatar.with_format('png').read()
-            except Exception as av_err:
-                print(f"[DEBUG][Short] avatar.read() failed: {av_err!r}")
-                avatar_bytes = b""
+                return await progress.finish("❌ Download failed: file not created.")
 
             # Build embed (BytesIO or path; timestamp ignored by renderer)
             try:
                 image_obj = await create_embed_image(
                     user=ctx.author,
-                    avatar_bytes=avatar_bytes,
+                    avatar_bytes=b"",
+                    avatar_image=await avatar,
                     title="YouTube Short downloaded!",
                     elapsed=elapsed,
                     timestamp=None,
@@ -141,39 +135,27 @@ class ShortDownloader(commands.Cog):
                 print(f"[ERROR][Short] create_embed_image failed:\n{traceback.format_exc()}")
                 image_obj = None
 
-            # DM video
-            try:
-                await ctx.author.send(file=discord.File(filename))
-            except discord.Forbidden:
-                print("[WARNING][Short] Could not DM video file.")
-            except Exception as dm_err:
-                print(f"[WARNING][Short] DM failed: {dm_err}")
+            # Video (unless streamed) + embed DM, channel embed: concurrently
+            await deliver(
+                ctx, tag="Short", media=None if streamed else filename,
+                image=image_obj, image_name=embed_filename("short"), view_factory=InviteButton,
+            )
 
-            # DM + channel embed (works with BytesIO or filepath)
-            try:
-                if image_obj:
-                    if hasattr(image_obj, "read"):  # BytesIO
-                        await ctx.author.send(file=discord.File(image_obj, filename="short.png"), view=InviteButton())
-                        image_obj.seek(0)
-                        await ctx.send(file=discord.File(image_obj, filename="short.png"), view=InviteButton())
-                    elif isinstance(image_obj, str) and os.path.exists(image_obj):
-                        await ctx.author.send(file=discord.File(image_obj, filename="short.png"), view=InviteButton())
-                        await ctx.send(file=discord.File(image_obj, filename="short.png"), view=InviteButton())
-            except Exception as dm_embed_err:
-                print(f"[DEBUG][Short] DM/channel embed failed: {dm_embed_err}")
-
-            # Done
-            try:
-                await status.delete()
-            except Exception:
-                pass
+            progress.close()
+            delete_quietly(status)
 
+        except TooLarge as e:
+            print(f"[DEBUG][Short] Too large to deliver: {e}")
+            await progress.finish(f"❌ This Short is too large to send (limit {e.limit // (1024 * 1024)} MB).")
         except Exception:
             print(f"[ERROR][Short] Unexpected error:\n{traceback.format_exc()}")
-            await status.edit(content="❌ Failed to download the YouTube Short. Please try again later.")
+            await progress.finish("❌ Failed to download the YouTube Short. Please try again later.")
         finally:
-            # Cleanup only this job's files
-            shutil.rmtree(job_dir, ignore_errors=True)
+            # Job files go away once every requester sharing them is done
+            if flight:
+                flight.release()
+            elif job is not None:
+                job.cancel()  # gave up before the job finished: drop our place in it
 
 async def setup(bot):
     await bot.add_cog(ShortDownloader(bot))
@@ -4,11 +4,14 @@ import os
 import io
 import json
 import glob
+import asyncio
 import discord
 from discord.ext import commands
 
+from real_bot.storage import mapping_count, page_mappings
+
 STORAGE_DIR = os.getenv("STORAGE_DIR", "real_bot/data")
-GUILDS_JSON = os.path.join(STORAGE_DIR, "guilds.json")
+PAGE_SIZE = 25  # mappings per page; keeps each message well under 2000 chars
 
 def _load_all_json() -> dict:
     """Load all *.json files in STORAGE_DIR into a dict keyed by filename."""
@@ -24,45 +27,79 @@ def _load_all_json() -> dict:
             data[name] = f"<error reading: {e}>"
     return data
 
+class MappingPager(discord.ui.View):
+    """Prev/Next buttons over the guild -> channel store.
+
+    Pages are fetched from storage on demand with a keyset cursor (the last
+    guild id of the previous page), so only one page is ever in memory.
+    """
+
+    def __init__(self, author_id: int, total: int):
+        super().__init__(timeout=180)
+        self.author_id = author_id
+        self.total = total
+        self.pages = max(1, -(-total // PAGE_SIZE))
+        self.cursors = [None]  # cursors[i] = `after` value that yields page i
+        self.index = 0
+        self.message = None
+
+    async def render(self) -> str:
+        # A query under the SQLite backend: keep it off the event loop
+        rows = await asyncio.to_thread(page_mappings, self.cursors[self.index], PAGE_SIZE)
+        if rows and len(self.cursors) == self.index + 1:
+            self.cursors.append(rows[-1][0])
+        lines = [f"**{gid}** → <#{ch_id}> (`{ch_id}`)" for gid, ch_id in rows]
+        header = f"📄 Guild → Channel mapping — page {self.index + 1}/{self.pages} ({self.total} total)"
+        self.prev_page.disabled = self.index == 0
+        self.next_page.disabled = len(rows) < PAGE_SIZE or self.index + 1 >= self.pages
+        return header + "\n" + ("\n".join(lines) or "📭 Nothing here.")
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if interaction.user.id != self.author_id:
+            await interaction.response.send_message("❌ Only the person who ran `!showdb` can page through it.", ephemeral=True)
+            return False
+        return True
+
+    @discord.ui.button(label="◀ Prev", style=discord.ButtonStyle.secondary)
+    async def prev_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.index = max(0, self.index - 1)
+        await interaction.response.edit_message(content=await self.render(), view=self)
+
+    @discord.ui.button(label="Next ▶", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.index = min(self.index + 1, len(self.cursors) - 1)
+        await interaction.response.edit_message(content=await self.render(), view=self)
+
+    async def on_timeout(self):
+        if self.message:
+            try:
+                await self.message.edit(view=None)
+            except discord.HTTPException:
+                pass
+
 class ShowDB(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
 
     @commands.command(name="showdb", aliases=["db"])
     async def show_db(self, ctx):
-        """Show the stored configuration from local JSON files."""
+        """Show the stored guild -> channel configuration."""
+        # Prefer a paged summary of the guild -> channel store (JSON or SQLite)
+        try:
+            total = await asyncio.to_thread(mapping_count)
+        except Exception as e:
+            total = 0
+            await ctx.send(f"⚠️ Couldn't read the channel store: {e}")
+
+        if total:
+            pager = MappingPager(ctx.author.id, total)
+            pager.message = await ctx.send(await pager.render(), view=pager)
+            return
+        # If there are no mappings, fall back to generic listing below
         all_data = _load_all_json()
         if not all_data:
             return await ctx.send("📭 No local storage found yet.")
 
-        # Prefer a friendly summary for guilds.json (guild_id -> channel_id)
-        if os.path.exists(GUILDS_JSON):
-            try:
-                with open(GUILDS_JSON, "r", encoding="utf-8") as f:
-                    guild_map = json.load(f)
-            except Exception as e:
-                guild_map = None
-                await ctx.send(f"⚠️ Couldn't read `guilds.json`: {e}")
-
-            if isinstance(guild_map, dict) and guild_map:
-                lines = []
-                for gid_str, ch_id in guild_map.items():
-                    # Try to render a channel mention if we're in that guild
-                    mention = f"<#{ch_id}>"
-                    lines.append(f"**{gid_str}** → {mention} (`{ch_id}`)")
-                text = "\n".join(lines)
-                # If too long, attach as a file
-                if len(text) > 1800:
-                    buf = io.StringIO(text)
-                    buf.seek(0)
-                    return await ctx.send(
-                        "📄 Guild → Channel mapping:",
-                        file=discord.File(fp=io.BytesIO(buf.getvalue().encode("utf-8")), filename="guild_channel_map.txt")
-                    )
-                else:
-                    return await ctx.send(text or "📭 No guild-channel mappings stored.")
-            # If guild_map is empty, fall back to generic listing below
-
         # Generic listing of all JSON files (truncated to fit)
         pretty = []
         for name, content in all_data.items():
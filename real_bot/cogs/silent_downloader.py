@@ -1,7 +1,8 @@
-import yt_dlp
 import os
 import shutil
 
+from real_bot.utils.downloader import YDL_POOL
+
 DOWNLOAD_PATH = "real_bot_main/real_bot/downloads"
 COOKIE_FILE = "real_bot_main/real_bot/cookies_instagram.txt"
 
@@ -23,7 +24,7 @@ def silent_download(url: str):
     }
 
     try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        with YDL_POOL.borrow(ydl_opts) as ydl:
             info = ydl.extract_info(url, download=True)
             filename = ydl.prepare_filename(info)
             return filename
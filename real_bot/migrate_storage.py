@@ -0,0 +1,80 @@
+# real_bot/migrate_storage.py
+"""
+One-shot migration of the legacy JSON channel files into the SQLite store.
+
+Usage:
+    python -m real_bot.migrate_storage            # merge everything into STORAGE_DB
+    python -m real_bot.migrate_storage --dry-run  # just show what would be written
+
+Files are merged oldest-first, so data/guilds.json (the one the bot actually
+writes today) wins when two files disagree about a guild. Safe to re-run.
+"""
+from __future__ import annotations
+import os
+import json
+import argparse
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from real_bot import storage
+from real_bot.sqlite_store import SqliteStore
+
+BOT_DIR = Path(__file__).parent
+
+# Lowest priority first.
+LEGACY_FILES: List[Path] = [
+    Path("real_bot/real_bot/config.json"),  # the old utils/checker.py config file
+    BOT_DIR / "guild_channels.json",
+    BOT_DIR / "server_channels.json",
+    BOT_DIR / "server_config.json",
+    Path(os.getenv("STORAGE_DIR", "real_bot/data")) / "guilds.json",  # cogs/removed.py, cogs/showdb.py
+    storage.GUILDS_FILE,
+]
+
+def _read_json(path: Path) -> Dict:
+    try:
+        data = json.loads(path.read_text(encoding="utf-8") or "{}")
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        print(f"⚠️ Skipping {path}: {e}")
+        return {}
+    return data if isinstance(data, dict) else {}
+
+def collect(files: List[Path] = LEGACY_FILES) -> Tuple[Dict[int, int], List[Tuple[Path, int]]]:
+    """Merge all legacy files; returns (mapping, [(file, rows_read), ...])."""
+    merged: Dict[int, int] = {}
+    report = []
+    seen = set()
+    for path in files:
+        key = os.path.abspath(path)
+        if key in seen:
+            continue
+        seen.add(key)
+        rows = storage._compact(_read_json(path))
+        merged.update(rows)
+        report.append((path, len(rows)))
+    return merged, report
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Merge legacy JSON channel files into SQLite.")
+    parser.add_argument("--db", default=str(storage.DB_FILE), help="target SQLite file")
+    parser.add_argument("--dry-run", action="store_true", help="don't write anything")
+    args = parser.parse_args(argv)
+
+    merged, report = collect()
+    for path, n in report:
+        print(f"📄 {path}: {n} mapping(s)")
+    print(f"🔀 {len(merged)} unique guild(s) after merge")
+
+    if args.dry_run:
+        return 0
+
+    store = SqliteStore(Path(args.db))
+    written = store.upsert_many(sorted(merged.items()))
+    store.close()
+    print(f"✅ Wrote {written} row(s) to {args.db}. Set STORAGE_BACKEND=sqlite to use it.")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,6 +1,9 @@
 # real_bot/mybot.py
+import time
+_BOOT = time.perf_counter()  # for the time-to-ready report
 import os
 import shutil
+import asyncio
 import logging
 import discord
 from discord.ext import commands
@@ -17,50 +20,90 @@ DISCORD_TOKEN = os.getenv("DISCORD_TOKEN")
 intents = discord.Intents.default()
 intents.message_content = True
 
-bot = commands.Bot(
+class DownloaderBot(commands.Bot):
+    async def close(self):
+        from real_bot.utils import http_pool
+        try:
+            await super().close()
+        finally:
+            http_pool.close_all()  # shared yt-dlp connection pools
+
+bot = DownloaderBot(
     command_prefix="!",
     intents=intents,
     case_insensitive=True,
     help_command=None,
 )
 
+COGS = [
+    "real_bot.cogs.music_downloader",
+    "real_bot.cogs.reel_downloader",
+    "real_bot.cogs.short_downloader",
+    "real_bot.cogs.batch_downloader",
+    "real_bot.cogs.converter",
+    "real_bot.cogs.guild_setup",
+    "real_bot.cogs.set",
+    "real_bot.cogs.command",
+    "real_bot.cogs.help",
+    "real_bot.cogs.pfp",
+    "real_bot.cogs.removed",
+    "real_bot.cogs.showdb",
+]
+
+_prewarm_task = None
+
+async def _load_cog(ext: str):
+    t0 = time.perf_counter()
+    try:
+        await bot.load_extension(ext)
+        return ext, time.perf_counter() - t0, None
+    except Exception as e:
+        return ext, time.perf_counter() - t0, e
+
+@bot.event
+async def setup_hook():
+    # Runs once per process, before connecting — unlike on_ready, which fires
+    # again on every gateway reconnect.
+    t0 = time.perf_counter()
+    results = await asyncio.gather(*(_load_cog(ext) for ext in COGS))
+    total = time.perf_counter() - t0
+
+    failed = [(ext, err) for ext, _, err in results if err is not None]
+    print(f"📦 Imports done {(t0 - _BOOT) * 1000:.0f} ms after launch")
+    print(f"✅ Loaded {len(results) - len(failed)} cogs in {total * 1000:.0f} ms | ⚠️ Failed {len(failed)}")
+    for ext, took, err in sorted(results, key=lambda r: -r[1]):
+        print(f"   ⏱️ {ext.rsplit('.', 1)[-1]:<18} {took * 1000:7.1f} ms{'  ❌' if err else ''}")
+    for name, err in failed:
+        print(f"❌ Failed to load {name}: {err!r}")
+
 @bot.event
 async def on_ready():
+    global _prewarm_task
     print(f"🤖 Bot is online as {bot.user}")
     print(f"🔍 ffmpeg path: {shutil.which('ffmpeg') or 'not found'}")
-    print(f"🔧 MAX_CONCURRENT: {os.getenv('MAX_CONCURRENT', '2')}")
-
-    cogs = [
-        "real_bot.cogs.music_downloader",
-        "real_bot.cogs.reel_downloader",
-        "real_bot.cogs.short_downloader",
-        "real_bot.cogs.converter",
-        "real_bot.cogs.guild_setup",
-        "real_bot.cogs.set",
-        "real_bot.cogs.command",
-        "real_bot.cogs.help",
-        "real_bot.cogs.pfp",
-        "real_bot.cogs.removed",
-        "real_bot.cogs.showdb",
-    ]
-
-    loaded, failed = 0, []
-    for ext in cogs:
-        try:
-            await bot.load_extension(ext)
-            loaded += 1
-        except Exception as e:
-            failed.append((ext, e))
+    print(f"🔧 MAX_CONCURRENT: {os.getenv('MAX_CONCURRENT', '6')}")
 
-    print(f"✅ Loaded {loaded} cogs | ⚠️ Failed {len(failed)}")
-    for name, err in failed:
-        print(f"❌ Failed to load {name}: {err!r}")
+    # Connected: now pull in yt_dlp in the background so the first download doesn't pay for it
+    if _prewarm_task is None:
+        print(f"⏱️ Ready {(time.perf_counter() - _BOOT) * 1000:.0f} ms after launch")
+        _prewarm_task = asyncio.create_task(_prewarm_ytdlp())
 
     await bot.change_presence(
         status=discord.Status.online,
         activity=discord.Game(name="!help | !commands"),
     )
 
+async def _prewarm_ytdlp():
+    from real_bot.utils.downloader import prewarm
+    from real_bot.utils import http_pool
+    try:
+        took = await prewarm()
+        print(f"🔥 yt_dlp pre-warmed in {took * 1000:.0f} ms")
+        took = await http_pool.warm()
+        print(f"🔥 Connections to {', '.join(http_pool.WARM_HOSTS)} warmed in {took * 1000:.0f} ms")
+    except Exception as e:
+        print(f"[WARN] yt_dlp pre-warm failed: {e!r}")
+
 @bot.event
 async def on_command_error(ctx, error):
     from discord.ext.commands import CommandNotFound, CommandOnCooldown, MissingRequiredArgument
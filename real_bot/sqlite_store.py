@@ -0,0 +1,175 @@
+# real_bot/sqlite_store.py
+from __future__ import annotations
+import time
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS guild_channels (
+    guild_id   INTEGER PRIMARY KEY,
+    channel_id INTEGER NOT NULL,
+    updated_at REAL    NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_guild_channels_channel ON guild_channels (channel_id);
+"""
+
+class SqliteStore:
+    """guild_id -> channel_id mapping in a WAL-mode SQLite database.
+
+    Every write is a single-row upsert/delete in its own transaction, so cost
+    doesn't grow with the number of guilds and a crash never leaves a half
+    written file. WAL lets other processes read while one writes; busy_timeout
+    makes concurrent writers wait for the lock instead of failing.
+
+    Lookups are served from an in-memory map that is refreshed whenever
+    `PRAGMA data_version` changes, i.e. when another connection (or another
+    bot process) committed since our last read.
+    """
+
+    def __init__(self, path: Path, busy_timeout_ms: int = 5000):
+        self.path = Path(path)
+        self.busy_timeout_ms = busy_timeout_ms
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
+        self._cache: Dict[int, int] = {}
+        self._version: Optional[int] = None
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(
+                str(self.path),
+                timeout=self.busy_timeout_ms / 1000,
+                isolation_level=None,  # autocommit; we open transactions explicitly
+                check_same_thread=False,
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")  # durable + corruption-safe in WAL mode
+            conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def ensure(self) -> None:
+        with self._lock:
+            self._db()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+                self._version = None
+
+    def _data_version(self) -> int:
+        return self._db().execute("PRAGMA data_version").fetchone()[0]
+
+    def _map(self) -> Dict[int, int]:
+        with self._lock:
+            version = self._data_version()
+            if version != self._version:
+                rows = self._db().execute("SELECT guild_id, channel_id FROM guild_channels")
+                self._cache = {int(g): int(c) for g, c in rows}
+                self._version = version
+            return self._cache
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._version = None
+
+    def get(self, guild_id: int) -> Optional[int]:
+        return self._map().get(int(guild_id))
+
+    def upsert_many(self, rows: Iterable[Tuple[int, int]]) -> int:
+        """Upsert (guild_id, channel_id) pairs in one transaction; returns row count."""
+        now = time.time()
+        rows = [(int(g), int(c), now) for g, c in rows]
+        with self._lock:
+            db = self._db()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                db.executemany(
+                    "INSERT INTO guild_channels (guild_id, channel_id, updated_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(guild_id) DO UPDATE SET channel_id = excluded.channel_id, "
+                    "updated_at = excluded.updated_at",
+                    rows,
+                )
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            # Our own commit doesn't bump data_version for this connection,
+            # so keep the cache in step by hand.
+            if self._version is not None:
+                for g, c, _ in rows:
+                    self._cache[g] = c
+        return len(rows)
+
+    def set(self, guild_id: int, channel_id: int) -> None:
+        self.upsert_many([(guild_id, channel_id)])
+
+    def delete(self, guild_id: int) -> bool:
+        with self._lock:
+            cur = self._db().execute("DELETE FROM guild_channels WHERE guild_id = ?", (int(guild_id),))
+            self._cache.pop(int(guild_id), None)
+            return cur.rowcount > 0
+
+    def delete_many(self, guild_ids: Iterable[int]) -> List[int]:
+        removed = []
+        with self._lock:
+            db = self._db()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                for g in guild_ids:
+                    cur = db.execute("DELETE FROM guild_channels WHERE guild_id = ?", (int(g),))
+                    if cur.rowcount > 0:
+                        removed.append(int(g))
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            for g in removed:
+                self._cache.pop(g, None)
+        return removed
+
+    def guilds_for_channel(self, channel_id: int) -> List[int]:
+        with self._lock:
+            rows = self._db().execute(
+                "SELECT guild_id FROM guild_channels WHERE channel_id = ? ORDER BY guild_id",
+                (int(channel_id),),
+            )
+            return [int(g) for (g,) in rows]
+
+    def delete_by_channel(self, channel_id: int) -> List[int]:
+        with self._lock:
+            return self.delete_many(self.guilds_for_channel(channel_id))
+
+    def delete_where_value_matches(self, substr: str) -> int:
+        # Same semantics as the JSON store: substring match on the channel id.
+        with self._lock:
+            rows = self._db().execute(
+                "SELECT guild_id FROM guild_channels WHERE instr(CAST(channel_id AS TEXT), ?) > 0",
+                (substr,),
+            )
+            return len(self.delete_many([int(g) for (g,) in rows.fetchall()]))
+
+    def page(self, after: Optional[int], limit: int) -> List[Tuple[int, int]]:
+        with self._lock:
+            rows = self._db().execute(
+                "SELECT guild_id, channel_id FROM guild_channels WHERE guild_id > ? "
+                "ORDER BY guild_id LIMIT ?",
+                (-1 if after is None else int(after), int(limit)),
+            )
+            return [(int(g), int(c)) for g, c in rows]
+
+    def count(self) -> int:
+        with self._lock:
+            return self._db().execute("SELECT COUNT(*) FROM guild_channels").fetchone()[0]
+
+    def snapshot(self) -> Dict[int, int]:
+        return dict(self._map())
+
+    def dump(self) -> Dict[str, Any]:
+        return {str(g): {"channel_id": c} for g, c in sorted(self._map().items())}
@@ -1,61 +1,390 @@
 # real_bot/storage.py
 from __future__ import annotations
+import os
 import json
+import time
+import bisect
+import atexit
+import threading
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Set, Tuple
 
 # data dir next to this file: real_bot/data/guilds.json
 DATA_DIR = Path(__file__).parent / "data"
 GUILDS_FILE = DATA_DIR / "guilds.json"
+DB_FILE = Path(os.getenv("STORAGE_DB", str(DATA_DIR / "guilds.sqlite3")))
 
-def ensure_storage() -> None:
-    """Ensure storage folder and JSON file exist."""
-    DATA_DIR.mkdir(parents=True, exist_ok=True)
-    if not GUILDS_FILE.exists():
-        GUILDS_FILE.write_text("{}", encoding="utf-8")
+# "json" (default, data/guilds.json) or "sqlite" (WAL-mode DB_FILE, safe to share
+# between several bot processes). Run `python -m real_bot.migrate_storage` once
+# before switching an existing deployment to sqlite.
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "json").strip().lower()
 
-def _load() -> Dict[str, Any]:
-    ensure_storage()
+def _entry_channel(entry: Any) -> Optional[int]:
+    """Accept both {"channel_id": X} records and bare channel ids."""
+    if isinstance(entry, dict):
+        entry = entry.get("channel_id")
     try:
-        return json.loads(GUILDS_FILE.read_text(encoding="utf-8") or "{}")
-    except Exception:
-        return {}
+        return int(entry) if entry is not None else None
+    except (TypeError, ValueError):
+        return None
+
+def _compact(data: Dict[str, Any]) -> Dict[int, int]:
+    out: Dict[int, int] = {}
+    for gid, entry in data.items():
+        cid = _entry_channel(entry)
+        if cid is None:
+            continue
+        try:
+            out[int(gid)] = cid
+        except (TypeError, ValueError):
+            continue
+    return out
+
+class _MapIndex:
+    """guild -> channel map plus a channel -> guilds reverse index and sorted guild ids.
+
+    The sorted key list gives cheap keyset pagination (`page(after, limit)`),
+    the reverse index makes "which guilds point at channel X" a dict hit.
+    """
+
+    def __init__(self, mapping: Optional[Dict[int, int]] = None):
+        self.map: Dict[int, int] = dict(mapping or {})
+        self.by_channel: Dict[int, Set[int]] = {}
+        for gid, cid in self.map.items():
+            self.by_channel.setdefault(cid, set()).add(gid)
+        self.keys: List[int] = sorted(self.map)
+
+    def get(self, guild_id: int) -> Optional[int]:
+        return self.map.get(guild_id)
+
+    def put(self, guild_id: int, channel_id: int) -> None:
+        old = self.map.get(guild_id)
+        if old == channel_id:
+            return
+        if old is None:
+            bisect.insort(self.keys, guild_id)
+        else:
+            self._unlink(old, guild_id)
+        self.map[guild_id] = channel_id
+        self.by_channel.setdefault(channel_id, set()).add(guild_id)
+
+    def drop(self, guild_id: int) -> bool:
+        old = self.map.pop(guild_id, None)
+        if old is None:
+            return False
+        self._unlink(old, guild_id)
+        i = bisect.bisect_left(self.keys, guild_id)
+        if i < len(self.keys) and self.keys[i] == guild_id:
+            del self.keys[i]
+        return True
+
+    def _unlink(self, channel_id: int, guild_id: int) -> None:
+        guilds = self.by_channel.get(channel_id)
+        if guilds is not None:
+            guilds.discard(guild_id)
+            if not guilds:
+                del self.by_channel[channel_id]
+
+    def guilds_for(self, channel_id: int) -> List[int]:
+        return sorted(self.by_channel.get(channel_id, ()))
+
+    def page(self, after: Optional[int], limit: int) -> List[Tuple[int, int]]:
+        start = 0 if after is None else bisect.bisect_right(self.keys, after)
+        return [(g, self.map[g]) for g in self.keys[start:start + limit]]
+
+class JsonStore:
+    """guild_id -> channel_id mapping kept in a JSON snapshot plus an append-only journal.
+
+    Reads come from a process-wide in-memory index that is loaded once and
+    reloaded only when the files change on disk (mtime / inode / size), so the
+    channel gate in every download command is a dict lookup.
+
+    Writes update the index immediately and queue a one-line journal record.
+    A background writer thread wakes every `commit_ms`, appends everything
+    queued in a single write + fsync (group commit) and, every `compact_every`
+    records, folds the journal into a fresh snapshot written via temp file +
+    rename. Callers never touch the disk, and a crash loses at most the last
+    few milliseconds of writes instead of truncating the file.
+    """
+
+    def __init__(self, path: Path, commit_ms: float = 5.0, compact_every: int = 1000):
+        self.path = Path(path)
+        self.journal_path = self.path.with_suffix(".journal")
+        self.commit_interval = commit_ms / 1000
+        self.compact_every = compact_every
+        self._cache = _MapIndex()
+        self._sig: Optional[Tuple[Any, ...]] = None
+        self._lock = threading.RLock()
+        self._pending: List[str] = []
+        self._inflight = 0  # records handed to the writer but not yet fsynced
+        self._journaled = 0  # records in the journal since the last snapshot
+        self._wakeup = threading.Condition(self._lock)
+        self._flushed = threading.Condition(self._lock)
+        self._writer: Optional[threading.Thread] = None
+        self._closing = False
+
+    def ensure(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if not self.path.exists():
+            self.path.write_text("{}", encoding="utf-8")
+
+    # ----- disk format -----
+    def load_raw(self) -> Dict[str, Any]:
+        """Snapshot with the journal replayed on top (what's durable on disk)."""
+        self.ensure()
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8") or "{}")
+        except Exception:
+            data = {}
+        if not isinstance(data, dict):
+            data = {}
+        self._journaled = 0
+        good = 0
+        try:
+            with open(self.journal_path, "rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        # Torn tail from a crash mid-append: cut it off so later
+                        # appends don't land behind an unreadable line.
+                        f.close()
+                        os.truncate(self.journal_path, good)
+                        break
+                    good += len(line)
+                    self._journaled += 1  # bad ones too: the next snapshot drops them
+                    try:
+                        rec = json.loads(line)
+                        if rec.get("op") == "set":
+                            data[str(rec["g"])] = {"channel_id": int(rec["c"])}
+                        elif rec.get("op") == "del":
+                            data.pop(str(rec["g"]), None)
+                    except (ValueError, KeyError, TypeError, AttributeError):
+                        # Corrupt or incomplete record: skip just this one
+                        print(f"[ERROR][Storage] skipping bad journal record: {line!r}")
+        except FileNotFoundError:
+            pass
+        return data
+
+    def _write_snapshot(self, mapping: Dict[int, int]) -> None:
+        data = {str(g): {"channel_id": c} for g, c in mapping.items()}
+        tmp = self.path.with_suffix(".json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        # Everything in the journal is now in the snapshot; replaying it again
+        # after a crash right here would be a no-op, so truncating is safe.
+        with open(self.journal_path, "w", encoding="utf-8"):
+            pass
+
+    def _file_sig(self) -> Optional[Tuple[Any, ...]]:
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        try:
+            jst = os.stat(self.journal_path)
+            jsig = (jst.st_mtime_ns, jst.st_ino, jst.st_size)
+        except OSError:
+            jsig = None
+        return (st.st_mtime_ns, st.st_ino, st.st_size, jsig)
+
+    def _map(self) -> _MapIndex:
+        """Return the in-memory index, reloading it if the files changed on disk."""
+        sig = self._file_sig()
+        if sig is not None and sig == self._sig:
+            return self._cache
+        with self._lock:
+            if self._pending or self._inflight:
+                return self._cache  # our own queued writes are newer than the disk
+            sig = self._file_sig()
+            if sig is None or sig != self._sig:
+                self._cache = _MapIndex(_compact(self.load_raw()))
+                self._sig = self._file_sig()
+            return self._cache
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._sig = None
+
+    # ----- group commit writer -----
+    def _queue(self, records: List[Dict[str, Any]]) -> None:
+        """Append journal records for the background writer. Caller holds the lock."""
+        self._pending.extend(json.dumps(r, separators=(",", ":")) + "\n" for r in records)
+        if self._writer is None or not self._writer.is_alive():
+            self._closing = False
+            self._writer = threading.Thread(target=self._writer_loop, name="storage-journal", daemon=True)
+            self._writer.start()
+        self._wakeup.notify()
+
+    def _writer_loop(self) -> None:
+        while True:
+            with self._lock:
+                while not self._pending and not self._closing:
+                    self._wakeup.wait()
+                if not self._pending and self._closing:
+                    return
+            time.sleep(self.commit_interval)  # let a burst pile up into one commit
+            with self._lock:
+                batch, self._pending = self._pending, []
+                self._inflight = len(batch)
+                compact = self._journaled + len(batch) >= self.compact_every
+                state = dict(self._cache.map) if compact else None
+            try:
+                self.ensure()
+                with open(self.journal_path, "a", encoding="utf-8") as f:
+                    f.write("".join(batch))
+                    f.flush()
+                    os.fsync(f.fileno())
+                if state is not None:
+                    self._write_snapshot(state)
+            except Exception as e:
+                print(f"[ERROR][Storage] journal write failed: {e!r}")
+                with self._lock:
+                    self._pending[:0] = batch  # retry on the next tick
+                    self._inflight = 0
+                time.sleep(1)
+                continue
+            with self._lock:
+                self._journaled = 0 if state is not None else self._journaled + len(batch)
+                self._inflight = 0
+                self._sig = self._file_sig()
+                if not self._pending:
+                    self._flushed.notify_all()
 
-def _save(data: Dict[str, Any]) -> None:
-    ensure_storage()
-    GUILDS_FILE.write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding="utf-8")
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Block until every queued write is on disk; returns False on timeout."""
+        with self._lock:
+            if self._pending:
+                self._wakeup.notify()
+            return self._flushed.wait_for(lambda: not self._pending and not self._inflight, timeout)
+
+    def close(self) -> None:
+        """Flush, fold the journal into the snapshot and stop the writer thread."""
+        with self._lock:
+            self._closing = True
+            self._wakeup.notify()
+            writer = self._writer
+        if writer is not None:
+            writer.join()
+        with self._lock:
+            self._map()
+            if self._journaled:
+                self._write_snapshot(dict(self._cache.map))
+                self._journaled = 0
+                self._sig = self._file_sig()
+
+    # ----- mapping API -----
+    def get(self, guild_id: int) -> Optional[int]:
+        return self._map().get(int(guild_id))
+
+    def set(self, guild_id: int, channel_id: int) -> None:
+        with self._lock:
+            self._map().put(int(guild_id), int(channel_id))
+            self._queue([{"op": "set", "g": int(guild_id), "c": int(channel_id)}])
+
+    def delete(self, guild_id: int) -> bool:
+        return bool(self.delete_many([guild_id]))
+
+    def delete_many(self, guild_ids: List[int]) -> List[int]:
+        with self._lock:
+            index = self._map()
+            removed = [int(g) for g in guild_ids if index.drop(int(g))]
+            if removed:
+                self._queue([{"op": "del", "g": g} for g in removed])
+        return removed
+
+    def guilds_for_channel(self, channel_id: int) -> List[int]:
+        return self._map().guilds_for(int(channel_id))
+
+    def delete_by_channel(self, channel_id: int) -> List[int]:
+        return self.delete_many(self.guilds_for_channel(channel_id))
+
+    def delete_where_value_matches(self, substr: str) -> int:
+        index = self._map()
+        # Match against channel ids via the reverse index (one test per distinct
+        # channel) instead of serializing every record.
+        to_delete = [g for cid, guilds in list(index.by_channel.items()) if substr in str(cid) for g in guilds]
+        return len(self.delete_many(to_delete))
+
+    def page(self, after: Optional[int], limit: int) -> List[Tuple[int, int]]:
+        return self._map().page(after, limit)
+
+    def count(self) -> int:
+        return len(self._map().map)
+
+    def snapshot(self) -> Dict[int, int]:
+        return dict(self._map().map)
+
+    def dump(self) -> Dict[str, Any]:
+        return {str(g): {"channel_id": c} for g, c in self._map().map.items()}
+
+_STORE = None
+_STORE_LOCK = threading.Lock()
+
+def get_store():
+    """Return the process-wide store for the configured STORAGE_BACKEND."""
+    global _STORE
+    if _STORE is None:
+        with _STORE_LOCK:
+            if _STORE is None:
+                if STORAGE_BACKEND == "sqlite":
+                    from real_bot.sqlite_store import SqliteStore
+                    _STORE = SqliteStore(DB_FILE)
+                else:
+                    _STORE = JsonStore(
+                        GUILDS_FILE,
+                        commit_ms=float(os.getenv("STORAGE_COMMIT_MS", "5")),
+                        compact_every=int(os.getenv("STORAGE_COMPACT_EVERY", "1000")),
+                    )
+                atexit.register(_STORE.close)
+    return _STORE
+
+def ensure_storage() -> None:
+    """Ensure storage folder and backing file exist."""
+    get_store().ensure()
+
+def flush(timeout: Optional[float] = None) -> bool:
+    """Wait until all queued writes are on disk (no-op for backends that write synchronously)."""
+    store = get_store()
+    return store.flush(timeout) if hasattr(store, "flush") else True
+
+def invalidate_cache() -> None:
+    """Force the next lookup to re-read the backing store."""
+    get_store().invalidate()
 
 def get_channel_id(guild_id: int) -> Optional[int]:
-    data = _load()
-    entry = data.get(str(guild_id))
-    if not entry:
-        return None
-    cid = entry.get("channel_id")
-    return int(cid) if cid is not None else None
+    return get_store().get(guild_id)
+
+def guilds_for_channel(channel_id: int) -> List[int]:
+    """Guild ids whose configured channel is `channel_id` (reverse index lookup)."""
+    return get_store().guilds_for_channel(channel_id)
+
+def delete_by_channel(channel_id: int) -> List[int]:
+    """Remove every guild mapped to `channel_id`; returns the removed guild ids."""
+    return get_store().delete_by_channel(channel_id)
+
+def mapping_count() -> int:
+    return get_store().count()
+
+def page_mappings(after: Optional[int] = None, limit: int = 50) -> List[Tuple[int, int]]:
+    """Return up to `limit` (guild_id, channel_id) pairs with guild_id > `after`, in order.
+
+    Pass the last guild_id of one page as `after` to get the next one.
+    """
+    return get_store().page(after, limit)
 
 def set_channel_id(guild_id: int, channel_id: int) -> None:
-    data = _load()
-    data[str(guild_id)] = {"channel_id": int(channel_id)}
-    _save(data)
+    get_store().set(guild_id, channel_id)
 
 def dump_all() -> Dict[str, Any]:
     """Return the raw dict for debug/!showdb style commands."""
-    return _load()
+    return get_store().dump()
 
 def delete_by_guild(guild_id: int) -> bool:
     """Remove a guild's record; returns True if deleted."""
-    data = _load()
-    removed = data.pop(str(guild_id), None) is not None
-    if removed:
-        _save(data)
-    return removed
+    return get_store().delete(guild_id)
 
 def delete_where_value_matches(substr: str) -> int:
     """Delete any entries whose stringified value contains substr."""
-    data = _load()
-    to_delete = [k for k, v in data.items() if substr in json.dumps(v)]
-    for k in to_delete:
-        data.pop(k, None)
-    if to_delete:
-        _save(data)
-    return len(to_delete)
+    return get_store().delete_where_value_matches(substr)
@@ -0,0 +1,106 @@
+# real_bot/utils/audio.py
+"""
+Single-fetch audio pipeline for !music.
+
+The best audio stream is downloaded exactly once:
+
+- m4a / mp3 / aac come out as they are (yt-dlp's own m4a fixup remuxes DASH
+  m4a in place, no re-encode);
+- anything else (webm/opus mostly) is transcoded to MP3 by an ffmpeg process
+  fed through a pipe *while the download runs*: a StreamTap hands over the
+  growing file and a thread copies its bytes into ffmpeg's stdin, so the
+  transcode finishes about when the download does.
+
+If the size isn't known up front (nothing to stream against) the same
+ffmpeg pipe is fed from the finished file instead — still one fetch.
+"""
+import os
+import time
+import asyncio
+import subprocess
+
+from real_bot.utils.downloader import run_download
+from real_bot.utils.streaming import StreamTap, GrowingFile
+from real_bot.utils.fit_encode import ffmpeg_bin
+
+ACCEPTABLE_AUDIO_EXTS = ("m4a", "mp3", "aac")
+MP3_KBPS = int(os.getenv("MP3_KBPS", "192"))
+PIPE_CHUNK = 256 * 1024
+
+class TranscodeFailed(Exception):
+    pass
+
+def _pipe_to_mp3(src, dst: str) -> None:
+    """Copy the readable `src` into ffmpeg's stdin, writing an MP3 to dst. Blocking."""
+    proc = subprocess.Popen(
+        [ffmpeg_bin(), "-hide_banner", "-loglevel", "error", "-y", "-i", "pipe:0",
+         "-vn", "-c:a", "libmp3lame", "-b:a", f"{MP3_KBPS}k", dst],
+        stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+    )
+    try:
+        while True:
+            chunk = src.read(PIPE_CHUNK)
+            if not chunk:
+                break
+            proc.stdin.write(chunk)
+        proc.stdin.close()
+    except BrokenPipeError:
+        pass  # ffmpeg quit early; its exit code says why
+    except BaseException:
+        proc.kill()
+        proc.wait()
+        raise
+    err = proc.stderr.read()
+    if proc.wait() != 0:
+        raise TranscodeFailed(f"ffmpeg exited {proc.returncode}: {err.decode(errors='replace')[-300:]}")
+
+async def fetch_audio(opts: dict, info: dict) -> str:
+    """Download the selected audio once; returns an m4a/mp3/aac path.
+
+    `opts` must not carry postprocessors: conversion happens here, overlapped
+    with the download.
+    """
+    ffmpeg = ffmpeg_bin()
+    tap = StreamTap(max_bytes=2 ** 62, allow_dash=True)
+    download = asyncio.ensure_future(run_download(opts, info, tap=tap))
+    await asyncio.wait({tap.ready, download}, return_when=asyncio.FIRST_COMPLETED)
+    growing = tap.ready.result() if tap.ready.done() else None
+
+    if growing is not None:
+        ext = os.path.splitext(growing.name)[1].lstrip(".").lower()
+        if ext in ACCEPTABLE_AUDIO_EXTS or ffmpeg is None:
+            GrowingFile.close(growing)
+            return await download
+        # Transcode as the bytes arrive
+        dst = os.path.splitext(growing.name)[0] + ".mp3"
+        t0 = time.perf_counter()
+        transcode = asyncio.ensure_future(asyncio.to_thread(_pipe_to_mp3, growing, dst))
+        try:
+            await asyncio.wait({download, transcode})
+        finally:
+            GrowingFile.close(growing)
+        # A failed download also breaks the pipe; report the download's error
+        path = download.result()
+        if transcode.exception() is not None:
+            print(f"[WARN][Audio] MP3 transcode failed, sending {ext}: {transcode.exception()}")
+            return path
+        print(f"[DEBUG][Audio] {ext} -> mp3 piped during download ({time.perf_counter() - t0:.1f}s)")
+        return dst
+
+    path = await download
+    ext = os.path.splitext(path)[1].lstrip(".").lower()
+    if ext in ACCEPTABLE_AUDIO_EXTS or ffmpeg is None:
+        return path
+    dst = os.path.splitext(path)[0] + ".mp3"
+    # Same shape as a yt-dlp postprocessor event, so status messages can show it
+    for hook in opts.get("postprocessor_hooks", ()):
+        hook({"status": "started", "postprocessor": "MP3"})
+    t0 = time.perf_counter()
+    try:
+        with open(path, "rb") as src:
+            await asyncio.to_thread(_pipe_to_mp3, src, dst)
+    except TranscodeFailed as e:
+        print(f"[WARN][Audio] MP3 transcode failed, sending {ext}: {e}")
+        return path
+    print(f"[DEBUG][Audio] {ext} -> mp3 after download ({time.perf_counter() - t0:.1f}s)")
+    return dst
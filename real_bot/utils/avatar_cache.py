@@ -0,0 +1,99 @@
+# real_bot/utils/avatar_cache.py
+"""
+In-memory LRU of avatars ready to paste into the embed image.
+
+Entries are keyed by (user id, avatar hash): a new avatar has a new hash, so
+nothing is ever stale. Each holds the avatar already decoded, resized to
+AVATAR_SIZE and masked to a circle (RGBA), so a hit costs no request, no
+PNG decode and no resize.
+
+Misses fetch the smallest CDN size that covers AVATAR_SIZE (256 px for the
+207 px slot) instead of the full-size image. Concurrent misses for the same
+key share one fetch. The cache is capped at AVATAR_CACHE_BYTES of pixel data.
+"""
+import io
+import os
+import asyncio
+from collections import OrderedDict
+
+from PIL import Image, ImageChops, ImageDraw
+
+from real_bot.utils.embed_image import AVATAR_SIZE
+
+AVATAR_CACHE_BYTES = int(os.getenv("AVATAR_CACHE_BYTES", str(16 * 1024 * 1024)))
+CDN_SIZES = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096)  # what the Discord CDN accepts
+
+def fetch_size(target=AVATAR_SIZE) -> int:
+    """Smallest CDN size covering `target`."""
+    need = max(target)
+    return next((s for s in CDN_SIZES if s >= need), CDN_SIZES[-1])
+
+def _circle_mask(size) -> Image.Image:
+    mask = Image.new("L", size, 0)
+    ImageDraw.Draw(mask).ellipse((0, 0, *size), fill=255)
+    return mask
+
+def prepare_avatar(data: bytes) -> Image.Image:
+    """Decode, resize to AVATAR_SIZE and mask to a circle. CPU-bound; run it off the loop."""
+    with Image.open(io.BytesIO(data)) as im:
+        avatar = im.convert("RGBA").resize(AVATAR_SIZE, Image.LANCZOS)
+    # Keep the avatar's own transparency inside the circle
+    avatar.putalpha(ImageChops.multiply(avatar.getchannel("A"), _circle_mask(AVATAR_SIZE)))
+    return avatar
+
+class AvatarCache:
+    def __init__(self, max_bytes: int = AVATAR_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # (user id, hash) -> Image
+        self._inflight = {}  # (user id, hash) -> Task
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _size(img: Image.Image) -> int:
+        return img.width * img.height * len(img.getbands())
+
+    def _put(self, key, img: Image.Image) -> None:
+        if self.max_bytes <= 0:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.bytes -= self._size(old)
+        self._entries[key] = img
+        self.bytes += self._size(img)
+        while self.bytes > self.max_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self.bytes -= self._size(evicted)
+
+    async def _load(self, key, asset):
+        try:
+            data = await asset.replace(size=fetch_size(), format="png").read()
+            img = await asyncio.to_thread(prepare_avatar, data)
+        except Exception as e:
+            print(f"[DEBUG][AvatarCache] avatar fetch failed: {e!r}")
+            return None
+        finally:
+            self._inflight.pop(key, None)
+        self._put(key, img)
+        return img
+
+    async def get(self, user):
+        """The user's avatar as a masked AVATAR_SIZE RGBA image, or None if it can't be fetched."""
+        asset = user.display_avatar
+        key = (user.id, asset.key)
+        img = self._entries.get(key)
+        if img is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return img
+        self.misses += 1
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._inflight[key] = asyncio.ensure_future(self._load(key, asset))
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "bytes": self.bytes, "hits": self.hits, "misses": self.misses}
+
+AVATARS = AvatarCache()
@@ -0,0 +1,114 @@
+# real_bot/utils/batch.py
+"""
+Batch downloads (!batch): limits, URL handling and the zip the results go out in.
+
+Items of a batch download concurrently, at most BATCH_CONCURRENCY at a time
+(the same cap is passed to SCHEDULER as the batch's per-user limit, so
+global slots and guild fairness still apply). A playlist is expanded by flat
+extraction, up to BATCH_MAX_ITEMS items for the whole batch. Full YouTube
+videos (not Shorts) longer than BATCH_MAX_DURATION seconds are refused.
+
+Finished items are appended to a zip as they complete (stored, not
+deflated: the media is compressed already). When the next item wouldn't fit
+in one upload the current zip is closed and handed back to be sent, and a
+new part is started, so the user gets part 1 while the rest still downloads.
+An item that wouldn't fit in a part even on its own is refused (TooLarge)
+and reported like any other item too large to send.
+"""
+import os
+import asyncio
+import zipfile
+from urllib.parse import urlparse, parse_qs
+
+from real_bot.utils.downloader import YOUTUBE_HOSTS, media_key
+from real_bot.utils.limits import TooLarge
+
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "20"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "3"))
+BATCH_MAX_DURATION = int(os.getenv("BATCH_MAX_DURATION", "360"))  # 6 minutes, as !music
+
+# Local header + central directory entry, without the name
+_ZIP_ENTRY_OVERHEAD = 30 + 46 + 2 * 20
+_ZIP_END_OVERHEAD = 22
+
+def is_playlist_url(url: str) -> bool:
+    """A YouTube playlist link (/playlist?list=…, or a watch link inside one)."""
+    try:
+        parsed = urlparse(url)
+    except Exception:
+        return False
+    return parsed.netloc.lower() in YOUTUBE_HOSTS and bool(parse_qs(parsed.query).get("list"))
+
+def dedupe(urls) -> list:
+    """Drop repeats of the same media (any URL variant), keeping the first."""
+    seen, out = set(), []
+    for url in urls:
+        key = media_key(url) or url
+        if key not in seen:
+            seen.add(key)
+            out.append(url)
+    return out
+
+class ZipParts:
+    """Zip files written as items finish, split into parts of at most `max_bytes`."""
+
+    def __init__(self, job_dir: str, stem: str, max_bytes: int):
+        self.job_dir = job_dir
+        self.stem = stem
+        self.max_bytes = max_bytes
+        self.parts = 0
+        self._zip = None
+        self._path = None
+        self._size = 0
+        self._names = set()
+        self._lock = asyncio.Lock()
+
+    def _open(self) -> None:
+        self.parts += 1
+        self._path = os.path.join(self.job_dir, f"{self.stem}_part{self.parts}.zip")
+        self._zip = zipfile.ZipFile(self._path, "w", compression=zipfile.ZIP_STORED)
+        self._size = _ZIP_END_OVERHEAD
+        self._names = set()
+
+    def _close(self):
+        if self._zip is None:
+            return None
+        self._zip.close()
+        path, self._zip = self._path, None
+        return path
+
+    def _arcname(self, path: str) -> str:
+        stem, ext = os.path.splitext(os.path.basename(path))
+        name, n = stem + ext, 1
+        while name in self._names:
+            n += 1
+            name = f"{stem} ({n}){ext}"
+        self._names.add(name)
+        return name
+
+    def _add(self, path: str):
+        """Append `path`; returns a finished part's path if one had to be closed first."""
+        entry = os.path.getsize(path) + _ZIP_ENTRY_OVERHEAD + 2 * len(os.path.basename(path).encode())
+        if entry + _ZIP_END_OVERHEAD > self.max_bytes:
+            raise TooLarge(self.max_bytes, entry)  # its own part would be refused too
+        done = None
+        if self._zip is not None and self._names and self._size + entry > self.max_bytes:
+            done = self._close()
+        if self._zip is None:
+            self._open()
+        self._zip.write(path, arcname=self._arcname(path))
+        self._size += entry
+        return done
+
+    async def add(self, path: str):
+        """Add a finished item (off the loop); returns a full part to send now, or None.
+
+        Raises TooLarge, adding nothing, if the item can't fit in any part.
+        """
+        async with self._lock:
+            return await asyncio.to_thread(self._add, path)
+
+    async def close(self):
+        """Finish the last part; returns its path, or None if nothing was added."""
+        async with self._lock:
+            return await asyncio.to_thread(self._close)
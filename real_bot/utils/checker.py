@@ -1,28 +1,13 @@
-import json
-import os
+from real_bot.storage import get_channel_id, set_channel_id
 
-CONFIG_PATH = "real_bot/real_bot/config.json"
-
-def load_config():
-    if not os.path.exists(CONFIG_PATH):
-        return {}
-    with open(CONFIG_PATH, "r") as f:
-        return json.load(f)
-
-def save_config(config):
-    with open(CONFIG_PATH, "w") as f:
-        json.dump(config, f, indent=4)
+# Channel assignments live in real_bot.storage; the legacy config.json this
+# module used to read is folded in by `python -m real_bot.migrate_storage`.
 
 def get_assigned_channel(guild_id):
-    config = load_config()
-    return config.get(str(guild_id), {}).get("channel_id")
+    return get_channel_id(guild_id)
 
 def register_channel(guild_id, channel_id):
-    config = load_config()
-    if str(guild_id) not in config:
-        config[str(guild_id)] = {}
-    config[str(guild_id)]["channel_id"] = channel_id
-    save_config(config)
+    set_channel_id(guild_id, channel_id)
 
 def is_valid_channel(ctx):
     assigned_id = get_assigned_channel(ctx.guild.id)
@@ -0,0 +1,149 @@
+# real_bot/utils/delivery.py
+"""
+Delivering a finished job to Discord in as few round trips as possible.
+
+The cogs used to make every REST call in sequence (delete the command,
+status send + edit, avatar fetch, media DM, embed DM, channel embed, status
+delete). Here only the calls the user is waiting on are awaited:
+
+- deletes are fire-and-forget (`delete_quietly`);
+- the avatar is fetched from command start, while the job runs
+  (`fetch_avatar` returns a task; see avatar_cache.py);
+- `deliver()` sends the media and the embed image as one DM when they fit in
+  one upload, and posts the channel embed at the same time. Several media
+  files go out as few multi-file messages as the upload limit allows.
+"""
+import io
+import os
+import asyncio
+
+import discord
+
+from real_bot.utils.limits import EXACT_HEADROOM, upload_limit
+from real_bot.utils.avatar_cache import AVATARS
+from real_bot.utils.embed_image import embed_filename
+
+MAX_FILES_PER_MESSAGE = 10  # Discord's attachment cap
+
+_background = set()  # strong refs, or the loop may drop running tasks
+
+def fire_and_forget(coro, what: str) -> None:
+    """Run `coro` in the background, logging (not raising) its failure."""
+    task = asyncio.ensure_future(coro)
+    _background.add(task)
+
+    def _done(t):
+        _background.discard(t)
+        if not t.cancelled() and t.exception() is not None:
+            err = t.exception()
+            if not isinstance(err, (discord.Forbidden, discord.NotFound)):
+                print(f"[DEBUG][Delivery] {what} failed: {err!r}")
+
+    task.add_done_callback(_done)
+
+def delete_quietly(message) -> None:
+    if message is not None:
+        fire_and_forget(message.delete(), "delete message")
+
+def delete_invocation(ctx) -> None:
+    """Remove the command message when we're allowed to, without waiting for it."""
+    if ctx.guild and ctx.channel.permissions_for(ctx.guild.me).manage_messages:
+        delete_quietly(ctx.message)
+
+def fetch_avatar(user) -> asyncio.Task:
+    """Start getting the user's embed-ready avatar (PIL image, None on failure); await the task when needed."""
+    return asyncio.ensure_future(AVATARS.get(user))
+
+def _image_bytes(image):
+    """Embed image from create_embed_image (BytesIO or path) as bytes, or None."""
+    if image is None:
+        return None
+    if hasattr(image, "getvalue"):
+        return image.getvalue()
+    if isinstance(image, str) and os.path.exists(image):
+        with open(image, "rb") as f:
+            return f.read()
+    return None
+
+def _media_size(media) -> int:
+    if hasattr(media, "getbuffer"):
+        return media.getbuffer().nbytes
+    return os.path.getsize(media)
+
+def _media_file(media, name=None) -> discord.File:
+    if hasattr(media, "seek"):
+        media.seek(0)
+    return discord.File(media, filename=name or os.path.basename(str(media)))
+
+def _media_list(media) -> list:
+    if media is None:
+        return []
+    return list(media) if isinstance(media, (list, tuple)) else [media]
+
+def fits_one_message(media, extra: int = 0, extra_files: int = 0) -> bool:
+    """Whether all of `media` (plus `extra` bytes in `extra_files` more files) fit in one DM."""
+    items = _media_list(media)
+    if len(items) + extra_files > MAX_FILES_PER_MESSAGE:
+        return False
+    return sum(_media_size(m) for m in items) + extra <= upload_limit(None) - EXACT_HEADROOM
+
+def _batches(items, room: int) -> list:
+    """Split media into consecutive groups that each fit in one message."""
+    batches, batch, size = [], [], 0
+    for m in items:
+        n = _media_size(m)
+        if batch and (len(batch) >= MAX_FILES_PER_MESSAGE or size + n > room):
+            batches.append(batch)
+            batch, size = [], 0
+        batch.append(m)
+        size += n
+    if batch:
+        batches.append(batch)
+    return batches
+
+async def deliver(ctx, *, tag: str, media=None, media_name=None, image=None,
+                  image_name: str = None, view_factory=None, content: str = None) -> None:
+    """DM `media` (path or BytesIO, or a list of paths; None when it was
+    streamed already) plus the embed `image`, and post the embed in the
+    channel, concurrently. `content` goes with the first DM.
+
+    Media and embed go out as one multipart DM when they fit in one upload;
+    otherwise media first, in as few messages as fit, then the embed.
+    Failures are logged per message, a closed DM doesn't stop the channel post.
+    """
+    img = _image_bytes(image)
+    image_name = image_name or embed_filename("embed")
+    view = view_factory or (lambda: None)
+    items = _media_list(media)
+    name = media_name if len(items) == 1 else None
+
+    def embed_file():
+        return discord.File(io.BytesIO(img), filename=image_name)
+
+    async def _send_dm():
+        user = ctx.author
+        text = content
+        if items and img is not None and fits_one_message(items, len(img), extra_files=1):
+            try:
+                return await user.send(content=text, files=[*(_media_file(m, name) for m in items), embed_file()], view=view())
+            except discord.HTTPException as e:
+                if isinstance(e, discord.Forbidden) or e.status != 413:
+                    raise
+                # over the per-request limit after all: fall back to separate messages
+        for batch in _batches(items, upload_limit(None) - EXACT_HEADROOM):
+            await user.send(content=text, files=[_media_file(m, name) for m in batch])
+            text = None
+        if img is not None:
+            await user.send(content=text, file=embed_file(), view=view())
+
+    async def _send_channel():
+        if img is not None:
+            await ctx.send(file=embed_file(), view=view())
+
+    dm, channel = await asyncio.gather(_send_dm(), _send_channel(), return_exceptions=True)
+    if isinstance(dm, discord.Forbidden):
+        print(f"[WARNING][{tag}] Unable to DM user (Forbidden), skipping DM.")
+    elif isinstance(dm, Exception):
+        print(f"[WARNING][{tag}] DM failed: {dm!r}")
+    if isinstance(channel, Exception):
+        print(f"[DEBUG][{tag}] Channel embed failed: {channel!r}")
@@ -0,0 +1,365 @@
+# real_bot/utils/downloader.py
+"""
+Shared yt-dlp helpers for the downloader cogs.
+
+The expensive part of a job is extraction (webpage, player JS, format list).
+`probe()` does it once, off the event loop, with `process=False` so the raw
+extractor result can be cached and handed to `download_info()`, which only
+runs format selection + the actual download via `process_ie_result`.
+
+Both run in a thread by default, or in worker processes with
+YTDLP_EXECUTOR=process (see procpool.py); cogs call `run_download()` and
+don't need to know which.
+
+Either way the YoutubeDL objects come from YDL_POOL: building one re-reads
+the cookie file, the extractor registry and the HTTP handlers, so instances
+are kept warm per option profile and lent out one job at a time.
+"""
+import os
+import copy
+import atexit
+import time
+import asyncio
+import threading
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager
+from urllib.parse import urlparse, parse_qs
+
+from real_bot.utils import http_pool
+from real_bot.utils.procpool import YTDLP_POOL
+from real_bot.utils.transfer import TRANSFER_OPTS, parallel_opts, platform_of, describe
+
+# Signed format URLs stay valid for a few hours; keep well inside that.
+INFO_CACHE_TTL = int(os.getenv("INFO_CACHE_TTL", "1800"))
+INFO_CACHE_MAX = int(os.getenv("INFO_CACHE_MAX", "256"))
+# Warm YoutubeDL instances: rebuilt after YDL_POOL_REFRESH seconds (picks up
+# refreshed cookie files), at most YDL_POOL_IDLE kept per profile.
+YDL_POOL_REFRESH = int(os.getenv("YDL_POOL_REFRESH", "900"))
+YDL_POOL_IDLE = int(os.getenv("YDL_POOL_IDLE", "4"))
+
+# yt_dlp pulls in every extractor (~0.2 s); import it on first use, or early
+# from a background thread via prewarm(), so loading the cogs stays cheap.
+_yt_dlp = None
+_yt_dlp_lock = threading.Lock()
+
+def _ytdlp():
+    global _yt_dlp
+    if _yt_dlp is None:
+        with _yt_dlp_lock:
+            if _yt_dlp is None:
+                import yt_dlp
+                http_pool.install()
+                _yt_dlp = yt_dlp
+    return _yt_dlp
+
+async def prewarm() -> float:
+    """Import yt_dlp off the loop; returns the seconds it took (0 if already loaded)."""
+    if _yt_dlp is not None:
+        return 0.0
+    t0 = time.perf_counter()
+    await asyncio.to_thread(_ytdlp)
+    return time.perf_counter() - t0
+
+YOUTUBE_HOSTS = (
+    "www.youtube.com", "youtube.com", "m.youtube.com", "music.youtube.com",
+    "www.youtube-nocookie.com", "youtube-nocookie.com",
+)
+INSTAGRAM_HOSTS = ("www.instagram.com", "instagram.com", "m.instagram.com", "instagr.am", "www.instagr.am")
+
+class QuietLogger:
+    def debug(self, msg): pass
+    def warning(self, msg): pass
+    def error(self, msg): pass
+
+def media_key(url: str):
+    """Canonical "<site>:<id>" for a supported URL, or None if we can't tell.
+
+    youtu.be/X, watch?v=X, /shorts/X and the mobile/music hosts all map to
+    youtube:X; tracking query params (si=, feature=, igsh=…) are ignored.
+    """
+    try:
+        parsed = urlparse(url)
+    except Exception:
+        return None
+    host = parsed.netloc.lower()
+    parts = [p for p in parsed.path.split("/") if p]
+    if host in YOUTUBE_HOSTS:
+        if parsed.path == "/watch":
+            vid = parse_qs(parsed.query).get("v", [None])[0]
+            return f"youtube:{vid}" if vid else None
+        if len(parts) >= 2 and parts[0] in ("shorts", "live", "embed", "v"):
+            return f"youtube:{parts[1]}"
+        return None
+    if host == "youtu.be" and parts:
+        return f"youtube:{parts[0]}"
+    if host in INSTAGRAM_HOSTS and len(parts) >= 2 and parts[0] in ("reel", "reels", "p"):
+        return f"instagram:{parts[1]}"
+    return None
+
+class InfoCache:
+    """Small TTL + LRU cache of raw (unprocessed) extractor results keyed by media_key."""
+
+    def __init__(self, ttl: float = INFO_CACHE_TTL, max_entries: int = INFO_CACHE_MAX):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        if key is None:
+            return None
+        with self._lock:
+            hit = self._data.get(key)
+            if hit is None:
+                return None
+            expires, info = hit
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return info
+
+    def put(self, key, info) -> None:
+        if key is None or self.ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, info)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+INFO_CACHE = InfoCache()
+
+# Options that may differ per job without needing a different instance.
+PER_JOB_OPTS = ("outtmpl", "progress_hooks", "postprocessor_hooks", "nopart", "logger", *TRANSFER_OPTS)
+HOOK_OPTS = ("progress_hooks", "postprocessor_hooks")  # callables: can't go to a worker process
+
+def _profile_key(opts: dict) -> str:
+    return repr(sorted((k, v) for k, v in opts.items() if k not in PER_JOB_OPTS))
+
+class _JobHooks:
+    """Hooks registered once per pooled instance; they call the current job's hooks."""
+
+    def __init__(self):
+        self.progress = ()
+        self.postprocessor = ()
+
+    def on_progress(self, d: dict) -> None:
+        for hook in self.progress:
+            hook(d)
+
+    def on_postprocess(self, d: dict) -> None:
+        for hook in self.postprocessor:
+            hook(d)
+
+class YdlPool:
+    """Warm YoutubeDL objects keyed by option profile (everything but PER_JOB_OPTS).
+
+    Per-job state goes in through public API only: `params` for the output
+    template and the other per-job options, and one add_progress_hook /
+    add_postprocessor_hook pair per instance that forwards to the borrowing
+    job's hooks.
+    """
+
+    def __init__(self, refresh: float = YDL_POOL_REFRESH, max_idle: int = YDL_POOL_IDLE):
+        self.refresh = refresh
+        self.max_idle = max_idle
+        self._idle = defaultdict(list)  # profile key -> [(created, ydl, hooks)]
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+
+    def _new(self, opts: dict):
+        hooks = _JobHooks()
+        ydl = _ytdlp().YoutubeDL({k: v for k, v in opts.items() if k not in HOOK_OPTS})
+        ydl.add_progress_hook(hooks.on_progress)
+        ydl.add_postprocessor_hook(hooks.on_postprocess)
+        self.created += 1
+        return time.monotonic(), ydl, hooks
+
+    @contextmanager
+    def borrow(self, opts: dict):
+        key = _profile_key(opts)
+        entry = None
+        with self._lock:
+            idle = self._idle[key]
+            while idle:
+                entry = idle.pop()
+                if time.monotonic() - entry[0] < self.refresh:
+                    self.reused += 1
+                    break
+                self._close(entry[1])
+                entry = None
+        if entry is None:
+            entry = self._new(opts)
+        _, ydl, hooks = entry
+        default_tmpl = opts.get("outtmpl", _ytdlp().utils.DEFAULT_OUTTMPL["default"])
+        ydl.params["outtmpl"] = dict(ydl.params["outtmpl"], default=default_tmpl)
+        for k in PER_JOB_OPTS:
+            if k in HOOK_OPTS or k == "outtmpl":
+                continue
+            if k in opts:
+                ydl.params[k] = opts[k]
+            else:
+                ydl.params.pop(k, None)
+        hooks.progress = tuple(opts.get("progress_hooks", ()))
+        hooks.postprocessor = tuple(opts.get("postprocessor_hooks", ()))
+        try:
+            yield ydl
+        except BaseException:
+            # Don't hand a half-failed instance to the next job
+            self._close(ydl)
+            raise
+        finally:
+            hooks.progress = hooks.postprocessor = ()
+        with self._lock:
+            if len(self._idle[key]) < self.max_idle:
+                self._idle[key].append(entry)
+                return
+        self._close(ydl)
+
+    @staticmethod
+    def _close(ydl) -> None:
+        try:
+            ydl.close()  # also writes back the cookie jar
+        except Exception as e:
+            print(f"[WARN][YdlPool] close failed: {e!r}")
+
+    def clear(self) -> None:
+        with self._lock:
+            entries = [e for idle in self._idle.values() for e in idle]
+            self._idle.clear()
+        for _, ydl, _ in entries:
+            self._close(ydl)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "profiles": len(self._idle),
+                "idle": sum(len(v) for v in self._idle.values()),
+                "created": self.created,
+                "reused": self.reused,
+            }
+
+YDL_POOL = YdlPool()
+atexit.register(YDL_POOL.clear)
+
+def selects_any(selector: str, formats: list) -> bool:
+    """Whether yt-dlp's format `selector` picks anything from `formats` (probed format dicts).
+
+    Blocking the first time (builds a YoutubeDL); run it off the loop.
+    """
+    with YDL_POOL.borrow({"quiet": True, "no_warnings": True, "logger": QuietLogger()}) as ydl:
+        pick = ydl.build_format_selector(selector)
+    ctx = {
+        "formats": formats,
+        "has_merged_format": any("none" not in (f.get("acodec"), f.get("vcodec")) for f in formats),
+        "incomplete_formats": (all(f.get("vcodec") == "none" for f in formats)
+                               or all(f.get("acodec") == "none" for f in formats)),
+    }
+    return next(iter(pick(ctx)), None) is not None
+
+def _extract_raw(url: str, opts: dict) -> dict:
+    with YDL_POOL.borrow(opts) as ydl:
+        return ydl.extract_info(url, download=False, process=False)
+
+async def probe(url: str, opts: dict) -> dict:
+    """Raw extractor result for url, from cache or a single off-loop extraction.
+
+    `opts` should carry the same cookies as the later download so the
+    extracted format URLs are valid for it.
+    """
+    key = media_key(url)
+    info = INFO_CACHE.get(key)
+    if info is not None:
+        return info
+    if YTDLP_POOL is not None:
+        info = await YTDLP_POOL.run(_extract_raw, url, opts)
+    else:
+        info = await asyncio.to_thread(_extract_raw, url, opts)
+    INFO_CACHE.put(key, info)
+    return info
+
+def _extract_flat(url: str, opts: dict, max_items: int) -> list:
+    opts = dict(opts, extract_flat="in_playlist", noplaylist=False, playlistend=max_items)
+    with YDL_POOL.borrow(opts) as ydl:
+        result = ydl.extract_info(url, download=False)
+    entries = result.get("entries") if result.get("_type") == "playlist" else [result]
+    urls = []
+    for entry in entries or ():
+        if not entry:
+            continue
+        link = entry.get("webpage_url") or entry.get("url")
+        if entry.get("ie_key") == "Youtube" and entry.get("id"):
+            link = f"https://www.youtube.com/watch?v={entry['id']}"
+        if link:
+            urls.append(link)
+    return urls[:max_items]
+
+async def expand_playlist(url: str, opts: dict, max_items: int) -> list:
+    """Item URLs of a playlist (at most `max_items`), by flat extraction: one
+    request for the list, no per-item extraction. A single video gives [its url].
+    """
+    if YTDLP_POOL is not None:
+        return await YTDLP_POOL.run(_extract_flat, url, opts, max_items)
+    return await asyncio.to_thread(_extract_flat, url, opts, max_items)
+
+SLIM_INFO_KEYS = ("id", "title", "duration", "ext", "filesize", "extractor_key")
+
+def _download(opts: dict, info: dict):
+    with YDL_POOL.borrow(opts) as ydl:
+        result = ydl.process_ie_result(copy.deepcopy(info), download=True)
+        downloads = result.get("requested_downloads") or []
+        if downloads and downloads[0].get("filepath"):
+            path = downloads[0]["filepath"]
+        else:
+            path = ydl.prepare_filename(result)
+    return path, {k: result.get(k) for k in SLIM_INFO_KEYS}
+
+def download_info(opts: dict, info: dict) -> str:
+    """Select formats and download from a probed info dict; returns the final file path.
+
+    Blocking — run it with asyncio.to_thread. The cached info is deep-copied
+    because yt-dlp mutates it while processing.
+    """
+    return _download(opts, info)[0]
+
+async def _run(opts: dict, info: dict, tap) -> str:
+    if YTDLP_POOL is None:
+        if tap is None:
+            return await asyncio.to_thread(download_info, opts, info)
+        opts = dict(opts, nopart=True, progress_hooks=[*opts.get("progress_hooks", ()), tap.hook])
+        try:
+            path = await asyncio.to_thread(download_info, opts, info)
+        except BaseException as e:
+            tap.close(error=e)
+            raise
+        tap.close()
+        return path
+    # No live progress from worker processes
+    opts = {k: v for k, v in opts.items() if k not in HOOK_OPTS}
+    path, slim = await YTDLP_POOL.run(_download, opts, info)
+    print(f"[DEBUG][YtdlpPool] {slim.get('extractor_key')}:{slim.get('id')} -> {os.path.basename(path)}")
+    return path
+
+async def run_download(opts: dict, info: dict, tap=None) -> str:
+    """download_info() off the loop: in a worker process if enabled, else a thread.
+
+    Workers send back only (path, slim info), never the full processed result.
+    `tap` (a streaming.StreamTap) lets the caller start uploading while the
+    file is still being written; it is ignored in process mode and for jobs
+    with postprocessors. Connections per job come from utils.transfer.
+    """
+    if tap is not None and (YTDLP_POOL is not None or opts.get("postprocessors")):
+        tap.close()  # workers can't call back into this loop; postprocessors rewrite the file
+        tap = None
+    async with parallel_opts(opts, info, streaming=tap is not None) as (opts, conns):
+        t0 = time.perf_counter()
+        path = await _run(opts, info, tap)
+        elapsed = time.perf_counter() - t0
+    size = os.path.getsize(path) if os.path.exists(path) else 0
+    print(
+        f"[DEBUG][Transfer] {platform_of(info)}:{info.get('id')} {size / 1048576:.1f} MB in {elapsed:.1f}s "
+        f"({size / 1048576 / max(elapsed, 1e-6):.1f} MB/s, {describe(opts, conns)})"
+    )
+    return path
@@ -1,5 +1,8 @@
 # utils/embed_image.py
 import os, io, time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image, ImageDraw, ImageFont
 
 AVATAR_SIZE = (207, 207)
@@ -11,6 +14,21 @@ DEFAULT_AVATAR = "real_bot/real_bot/default_avatar.png"
 FONT_BOLD      = "real_bot/real_bot/utils/fonts/arialbd.ttf"
 FONT_REGULAR   = "real_bot/real_bot/utils/fonts/arial.ttf"
 
+# Output: "png" (full RGBA, lossless), "webp" (lossless) or "png8" (256-colour
+# palette: smaller, but bands the avatar and gradients; opt-in only)
+EMBED_FORMAT = os.getenv("EMBED_FORMAT", "png").lower()
+EMBED_PNG_LEVEL = int(os.getenv("EMBED_PNG_LEVEL", "6"))  # zlib level, 0-9
+EMBED_WEBP_METHOD = int(os.getenv("EMBED_WEBP_METHOD", "0"))  # 0 = fastest, 6 = smallest
+EMBED_EXT = "webp" if EMBED_FORMAT == "webp" else "png"
+
+# Pillow drops the GIL while encoding, so a thread keeps the render off the gateway loop.
+# One worker: the cached fonts share a FreeType face, which isn't thread-safe.
+_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embed")
+
+def embed_filename(stem: str) -> str:
+    """Attachment name with the extension of the configured EMBED_FORMAT."""
+    return f"{stem}.{EMBED_EXT}"
+
 def wrap_text(text, font, max_width):
     words = text.split()
     lines, current = [], ""
@@ -26,24 +44,35 @@ def wrap_text(text, font, max_width):
         lines.append(current)
     return lines
 
-async def create_embed_image(user, avatar_bytes, title, elapsed, timestamp, mode):
-    try:
-        template = Image.open(TEMPLATE_PATH).convert("RGBA")
-    except Exception as e:
-        print("[ERROR - embed] Template load error:", e)
-        return None
+_assets = None
+_assets_lock = threading.Lock()
 
-    try:
-        title_font  = ImageFont.truetype(FONT_BOLD, 28)
-        sub_font    = ImageFont.truetype(FONT_REGULAR, 20)
-        footer_font = ImageFont.truetype(FONT_BOLD, 28)
-    except Exception as e:
-        print("[ERROR - embed] Font load error:", e)
-        return None
+def _load_assets():
+    """Static layers, loaded once: (template + checkmark base, fonts, avatar mask).
 
-    draw = ImageDraw.Draw(template)
+    Raises if the template or fonts can't be loaded, so the next render
+    retries instead of caching the failure.
+    """
+    global _assets
+    if _assets is None:
+        with _assets_lock:
+            if _assets is None:
+                base = Image.open(TEMPLATE_PATH).convert("RGBA")
+                try:
+                    checkmark = Image.open(CHECKMARK_PATH).convert("RGBA").resize((42, 42))
+                    base.paste(checkmark, (330, 180), checkmark)
+                except Exception as e:
+                    print("[ERROR - embed] Checkmark icon failed:", e)
+                fonts = {
+                    "bold": ImageFont.truetype(FONT_BOLD, 28),  # title + footer
+                    "regular": ImageFont.truetype(FONT_REGULAR, 20),
+                }
+                mask = Image.new("L", AVATAR_SIZE, 0)
+                ImageDraw.Draw(mask).ellipse((0, 0, *AVATAR_SIZE), fill=255)
+                _assets = (base, fonts, mask)
+    return _assets
 
-    # avatar
+def _paste_avatar(template, avatar_bytes, mask):
     try:
         avatar = Image.open(io.BytesIO(avatar_bytes)).convert("RGBA").resize(AVATAR_SIZE)
     except Exception:
@@ -52,27 +81,49 @@ async def create_embed_image(user, avatar_bytes, title, elapsed, timestamp, mode
         except Exception as e:
             print("[ERROR - embed] Default avatar load failed:", e)
             avatar = Image.new("RGBA", AVATAR_SIZE, (0, 0, 0, 0))
-            m = Image.new("L", AVATAR_SIZE, 0)
-            ImageDraw.Draw(m).ellipse((0,0,*AVATAR_SIZE), fill=255)
-            avatar.putalpha(m)
-
-    mask = Image.new("L", AVATAR_SIZE, 0)
-    ImageDraw.Draw(mask).ellipse((0, 0, *AVATAR_SIZE), fill=255)
+            avatar.putalpha(mask)
     template.paste(avatar, AVATAR_POSITION, mask)
 
+def _encode(image, buf) -> None:
+    if EMBED_FORMAT == "webp":
+        # in lossless mode `quality` is encoder effort: 0 is fastest, size barely differs
+        image.save(buf, format="WEBP", lossless=True, quality=0, method=EMBED_WEBP_METHOD)
+    elif EMBED_FORMAT == "png8":
+        image.quantize(256, method=Image.Quantize.FASTOCTREE).save(buf, format="PNG", compress_level=EMBED_PNG_LEVEL)
+    else:
+        image.save(buf, format="PNG", compress_level=EMBED_PNG_LEVEL)
+
+async def create_embed_image(user, avatar_bytes, title, elapsed, timestamp, mode, avatar_image=None):
+    # avatar_image: a ready AVATAR_SIZE RGBA avatar, already circle-masked (utils.avatar_cache)
+    # Returns a BytesIO in EMBED_FORMAT; name the attachment with embed_filename()
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_EXECUTOR, _render, str(user), avatar_bytes, title, elapsed, avatar_image)
+
+def _render(user, avatar_bytes, title, elapsed, avatar_image):
+    try:
+        base, fonts, mask = _load_assets()
+    except Exception as e:
+        print("[ERROR - embed] Asset load error:", e)
+        return None
+
+    # static layers (template + checkmark) are shared; draw on a copy
+    template = base.copy()
+    draw = ImageDraw.Draw(template)
+    title_font = footer_font = fonts["bold"]
+    sub_font = fonts["regular"]
+
+    # avatar
+    if avatar_image is not None:
+        template.paste(avatar_image, AVATAR_POSITION, avatar_image)
+    else:
+        _paste_avatar(template, avatar_bytes, mask)
+
     # title
     y = 180
     for line in wrap_text(title, title_font, 470):
         draw.text((380, y), line, font=title_font, fill="white")
         y += title_font.size + 8
 
-    # check
-    try:
-        checkmark = Image.open(CHECKMARK_PATH).convert("RGBA").resize((42, 42))
-        template.paste(checkmark, (330, 180), checkmark)
-    except Exception as e:
-        print("[ERROR - embed] Checkmark icon failed:", e)
-
     # elapsed
     if elapsed:
         draw.text((320, y + 10), f"Downloaded in {elapsed:.2f}s", font=sub_font, fill="white")
@@ -82,6 +133,6 @@ async def create_embed_image(user, avatar_bytes, title, elapsed, timestamp, mode
 
     # return as bytes
     buf = io.BytesIO()
-    template.save(buf, format="PNG")
+    _encode(template, buf)
     buf.seek(0)
     return buf
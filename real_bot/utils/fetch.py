@@ -0,0 +1,203 @@
+# real_bot/utils/fetch.py
+"""
+The download pipelines shared by !reel, !short, !music and !batch, with the
+formats and cookie files they use.
+
+fetch_video() / fetch_music() run one item end to end: media cache, probe,
+size (and duration) gate, a SCHEDULER slot, the download (a video is
+re-encoded down to size when allowed) and publishing to the cache. They
+return (path, cleanup) for DOWNLOADS.join; the cogs keep the Discord side
+(validation, status message, delivery).
+
+    key = job_key(url, REEL_FORMAT, limit)
+    flight = await DOWNLOADS.join(key, lambda: fetch_video(url, REEL_FORMAT, ...))
+"""
+import os
+import shutil
+import asyncio
+import tempfile
+
+from real_bot.utils.downloader import QuietLogger, probe, run_download
+from real_bot.utils.audio import fetch_audio
+from real_bot.utils.media_cache import MEDIA_CACHE, cache_key
+from real_bot.utils.scheduler import SCHEDULER, estimate_cost
+from real_bot.utils.limits import TooLarge, EXACT_HEADROOM, check_fits, fit_format, is_format_unavailable
+from real_bot.utils.fit_encode import FitFailed, can_fit, fit_to_size
+from real_bot.utils.progress import JobProgress
+
+FFMPEG_PATH = os.getenv("FFMPEG_PATH")  # optional override
+INSTAGRAM_COOKIES = "real_bot/real_bot/cookies_instagram.txt"
+YOUTUBE_COOKIES = "real_bot/real_bot/cookies_youtube.txt"
+REEL_FORMAT = "best"
+SHORT_FORMAT = "mp4"
+# One stream, fetched once: native m4a when there is one, else the best audio
+# (converted to MP3 while it downloads, see utils/audio.py)
+AUDIO_FORMAT = 'bestaudio[ext=m4a]/bestaudio/best'
+MUSIC_MAX_DURATION = 360  # 6 minutes
+
+class ProbeFailed(Exception):
+    pass
+
+class TooLong(Exception):
+    def __init__(self, limit: int):
+        super().__init__(f"longer than {limit}s")
+        self.limit = limit
+
+def job_key(url: str, fmt: str, limit: int):
+    """DOWNLOADS / media cache key for url fetched with `fmt` under `limit` bytes."""
+    return cache_key(url, fit_format(fmt, limit))
+
+async def fetch_video(url: str, fmt: str, cookies: str, limit: int, guild_id: int, user_id: int,
+                      tap=None, progress=None, *, refit: bool = True, per_user: int = None,
+                      max_duration: int = None, tag: str = "Video"):
+    """Probe + download one video; returns (path, cleanup) for DOWNLOADS.join.
+
+    Only formats that fit in `limit` bytes are fetched. With `refit`, media
+    with none is re-encoded down to size (FIT_ENCODE), else it's TooLarge.
+    Videos over `max_duration` seconds are TooLong. `tap` streams the file
+    while it downloads; `progress` (a StatusEditor) shows the queue position
+    and the encode. `per_user` overrides the scheduler's per-user cap (see
+    !batch).
+    """
+    job_format = fit_format(fmt, limit)
+    key = cache_key(url, job_format)
+    # Already downloaded this exact media/format? Upload straight from the cache.
+    cached = await asyncio.to_thread(MEDIA_CACHE.lookup, key)
+    if cached:
+        print(f"[DEBUG][{tag}] Media cache hit for {url!r}")
+        return cached, lambda: MEDIA_CACHE.release(cached)
+
+    # Unique per-job folder, removed once every requester sharing it is done
+    job_dir = tempfile.mkdtemp(prefix=f"{tag.lower()}_")
+    filename = None
+
+    def cleanup():
+        MEDIA_CACHE.release(filename)  # unpin the cached copy, if any
+        shutil.rmtree(job_dir, ignore_errors=True)
+
+    try:
+        ydl_opts = {
+            'format': job_format,
+            'outtmpl': os.path.join(job_dir, "%(title).80B.%(ext)s"),
+            'quiet': True,
+            'no_warnings': True,
+            'cookiefile': cookies,
+            'logger': QuietLogger(),
+        }
+        if FFMPEG_PATH:
+            ydl_opts['ffmpeg_location'] = FFMPEG_PATH
+
+        # Extraction is cached per video, so a repeat link skips it entirely
+        info = await probe(url, ydl_opts)
+        if max_duration and (info.get('duration') or 0) > max_duration:
+            raise TooLong(max_duration)
+        # Nothing that fits? Stop before spending a slot or any bandwidth,
+        # unless we may re-encode it down ourselves
+        shrink = False
+        try:
+            await asyncio.to_thread(check_fits, info, limit, fmt)
+        except TooLarge:
+            if not (refit and can_fit(info, limit)):
+                raise
+            shrink = True
+        # Progress/post-processing hooks feed everyone watching this job
+        job_opts = dict(ydl_opts, **JobProgress(key).hooks())
+        on_position = progress.on_position if progress else None
+
+        # Heavy work off the loop, in the shared fair queue (cost from the probe)
+        async with SCHEDULER.slot(guild_id, user_id, estimate_cost(info), on_position=on_position, per_user=per_user):
+            if not shrink:
+                try:
+                    filename = await run_download(job_opts, info, tap=tap)
+                except Exception as e:
+                    if not is_format_unavailable(e):
+                        raise
+                    # fitted selector matched nothing
+                    if not (refit and can_fit(info, limit)):
+                        raise TooLarge(limit) from e
+                    shrink = True
+            if shrink:
+                filename = await run_download(dict(job_opts, format=fmt), info)
+
+        if shrink:
+            if progress:
+                progress.set("🗜️ Compressing to fit Discord's upload limit…")
+            try:
+                filename, took = await fit_to_size(filename, limit - EXACT_HEADROOM, info.get("duration"))
+            except FitFailed as e:
+                raise TooLarge(limit) from e
+            print(f"[DEBUG][{tag}] Fit-to-size encode took {took:.1f}s")
+        filename = await asyncio.to_thread(MEDIA_CACHE.publish, key, filename)
+    except BaseException:
+        cleanup()
+        raise
+    return filename, cleanup
+
+async def fetch_music(url: str, limit: int, guild_id: int, user_id: int, on_position=None, per_user: int = None):
+    """Probe + download one video's audio; returns (path, cleanup) for DOWNLOADS.join.
+
+    Downloads run in the shared SCHEDULER under the requester's guild/user
+    (`per_user` overrides its per-user cap, see !batch) and only fetch what
+    fits in `limit` bytes. Raises ProbeFailed, TooLong (MUSIC_MAX_DURATION)
+    or TooLarge.
+    """
+    audio_format = fit_format(AUDIO_FORMAT, limit)
+
+    # --- Media cache (a hit already passed the duration gate once) ---
+    audio_key = cache_key(url, audio_format)
+    cached_audio = await asyncio.to_thread(MEDIA_CACHE.lookup, audio_key)
+    if cached_audio:
+        print(f"[DEBUG] (Music) Media cache hit for {url!r}")
+        return cached_audio, lambda: MEDIA_CACHE.release(cached_audio)
+
+    # --- Probe metadata (duration gate) ---
+    # One extraction, off the loop; the same info feeds the download below.
+    probe_opts = {
+        'quiet': True,
+        'no_warnings': True,
+        'noplaylist': True,
+        'cookiefile': YOUTUBE_COOKIES,
+        'logger': QuietLogger(),
+    }
+    try:
+        info = await probe(url, probe_opts)
+    except Exception as e:
+        raise ProbeFailed(e) from e
+    if (info.get('duration', 0) or 0) > MUSIC_MAX_DURATION:
+        raise TooLong(MUSIC_MAX_DURATION)
+    # Nothing that fits? Stop before spending a slot or any bandwidth
+    await asyncio.to_thread(check_fits, info, limit, AUDIO_FORMAT)
+    cost = estimate_cost(info)
+
+    # --- Unique job directory ---
+    job_dir = tempfile.mkdtemp(prefix="music_")
+    final_audio = None
+
+    def cleanup():
+        MEDIA_CACHE.release(final_audio)  # unpin the cached copy, if any
+        shutil.rmtree(job_dir, ignore_errors=True)
+
+    try:
+        ydl_opts = {
+            'format': audio_format,
+            'outtmpl': f"{job_dir}/%(title).80B.%(ext)s",
+            'noplaylist': True,
+            'quiet': True,
+            'no_warnings': True,
+            'cookiefile': YOUTUBE_COOKIES,
+            'logger': QuietLogger(),
+            # Live progress for everyone waiting on this job
+            **JobProgress(audio_key).hooks(),
+        }
+        if FFMPEG_PATH:
+            ydl_opts['ffmpeg_location'] = FFMPEG_PATH
+
+        # Single fetch; non-m4a audio is piped through ffmpeg to MP3 as it arrives.
+        # (6 min at 192 kbit/s is ~8.6 MB, inside the DM limit.)
+        async with SCHEDULER.slot(guild_id, user_id, cost, on_position=on_position, per_user=per_user):
+            final_audio = await fetch_audio(ydl_opts, info)
+        final_audio = await asyncio.to_thread(MEDIA_CACHE.publish, audio_key, final_audio)
+    except BaseException:
+        cleanup()
+        raise
+    return final_audio, cleanup
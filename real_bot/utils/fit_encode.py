@@ -0,0 +1,110 @@
+# real_bot/utils/fit_encode.py
+"""
+Fit-to-size re-encode for media that has no stored format under the upload
+limit (long reels, high-bitrate Shorts). Opt-in with FIT_ENCODE=1.
+
+The target bitrate comes from the byte budget and the duration:
+
+    video kbps = budget * 8 / duration / 1000 * FIT_SAFETY - audio kbps
+
+and ffmpeg does a single capped-bitrate x264 pass, downscaling when the
+bitrate is too low for the source resolution. If the result still overshoots
+(short clips, VBR spikes) it re-runs once with the bitrate scaled down by the
+overshoot.
+
+Encodes are CPU-bound, so they run in their own bounded pool
+(FIT_ENCODE_WORKERS ffmpeg processes, FIT_ENCODE_THREADS threads each), not
+in a download slot.
+"""
+import os
+import time
+import shutil
+import asyncio
+
+FIT_ENCODE = os.getenv("FIT_ENCODE", "0").lower() in ("1", "true", "yes")
+FIT_ENCODE_WORKERS = int(os.getenv("FIT_ENCODE_WORKERS", "1"))
+FIT_ENCODE_THREADS = int(os.getenv("FIT_ENCODE_THREADS", "2"))
+FIT_ENCODE_PRESET = os.getenv("FIT_ENCODE_PRESET", "veryfast")
+FIT_AUDIO_KBPS = int(os.getenv("FIT_AUDIO_KBPS", "96"))
+FIT_MIN_VIDEO_KBPS = int(os.getenv("FIT_MIN_VIDEO_KBPS", "150"))  # below this it isn't worth watching
+FIT_SAFETY = 0.92  # container overhead + rate-control slack
+
+_ENCODE_SEMAPHORE = asyncio.Semaphore(max(1, FIT_ENCODE_WORKERS))
+
+class FitFailed(Exception):
+    pass
+
+def ffmpeg_bin():
+    # FFMPEG_PATH may point at the binary or at its folder (same as yt-dlp's ffmpeg_location)
+    loc = os.getenv("FFMPEG_PATH")
+    if loc:
+        if os.path.isdir(loc):
+            loc = os.path.join(loc, "ffmpeg.exe" if os.name == "nt" else "ffmpeg")
+        if os.path.exists(loc):
+            return loc
+    return shutil.which("ffmpeg")
+
+def target_kbps(duration, budget: int):
+    """(video kbps, audio kbps) that fit `budget` bytes, or None if it can't be done decently."""
+    if not duration or duration <= 0 or budget <= 0:
+        return None
+    total = budget * 8 / duration / 1000 * FIT_SAFETY
+    audio = min(FIT_AUDIO_KBPS, max(32, int(total * 0.15)))
+    video = int(total - audio)
+    if video < FIT_MIN_VIDEO_KBPS:
+        return None
+    return video, audio
+
+def can_fit(info: dict, budget: int) -> bool:
+    """Whether a fit-to-size encode is enabled and possible for this probed media."""
+    return FIT_ENCODE and ffmpeg_bin() is not None and target_kbps(info.get("duration"), budget) is not None
+
+def _max_height(video_kbps: int) -> int:
+    if video_kbps < 400:
+        return 360
+    if video_kbps < 900:
+        return 480
+    if video_kbps < 2000:
+        return 720
+    return 1080
+
+async def _encode(src: str, dst: str, video: int, audio: int) -> None:
+    h = _max_height(video)
+    cmd = [
+        ffmpeg_bin(), "-hide_banner", "-loglevel", "error", "-y", "-i", src,
+        "-c:v", "libx264", "-preset", FIT_ENCODE_PRESET, "-threads", str(FIT_ENCODE_THREADS),
+        "-b:v", f"{video}k", "-maxrate", f"{int(video * 1.2)}k", "-bufsize", f"{video * 2}k",
+        # shrink only; keep aspect, even dimensions for x264
+        "-vf", f"scale=-2:'min({h},ih)'",
+        "-c:a", "aac", "-b:a", f"{audio}k", "-ac", "2",
+        "-movflags", "+faststart",
+        dst,
+    ]
+    proc = await asyncio.create_subprocess_exec(*cmd, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE)
+    try:
+        _, err = await proc.communicate()
+    except BaseException:
+        proc.kill()
+        await proc.wait()
+        raise
+    if proc.returncode != 0:
+        raise FitFailed(f"ffmpeg exited {proc.returncode}: {err.decode(errors='replace')[-300:]}")
+
+async def fit_to_size(src: str, budget: int, duration) -> tuple:
+    """Re-encode `src` to at most `budget` bytes; returns (new path, seconds spent encoding)."""
+    rates = target_kbps(duration, budget)
+    if rates is None:
+        raise FitFailed("too long for the byte budget")
+    video, audio = rates
+    dst = os.path.splitext(src)[0] + ".fit.mp4"
+    async with _ENCODE_SEMAPHORE:
+        t0 = time.perf_counter()
+        for attempt in (1, 2):
+            await _encode(src, dst, video, audio)
+            size = os.path.getsize(dst)
+            if size <= budget:
+                return dst, time.perf_counter() - t0
+            video = int(video * budget / size * FIT_SAFETY)
+            if attempt == 2 or video < FIT_MIN_VIDEO_KBPS:
+                break
+    raise FitFailed(f"encode still {size} bytes for a {budget} byte budget")
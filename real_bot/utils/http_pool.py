@@ -0,0 +1,248 @@
+# real_bot/utils/http_pool.py
+"""
+Process-wide keep-alive HTTP pools and a DNS cache for yt-dlp traffic.
+
+yt-dlp's `requests` handler gives every YoutubeDL its own Session, and with
+it its own urllib3 pools: a fresh instance (new option profile, pool refresh,
+process worker) pays DNS + TCP + TLS again for youtube.com, googlevideo.com
+and instagram.com. install() makes those sessions share one transport
+adapter per TLS profile instead, so connections are reused across jobs:
+
+- HTTP_POOL_HOSTS host pools are kept (LRU), each holding up to
+  HTTP_POOL_PER_HOST idle keep-alive connections;
+- sessions still get their own cookie jar, only the sockets are shared;
+- connections opened by these pools resolve through a DNS cache
+  (DNS_CACHE_TTL seconds). Only yt-dlp's transport uses it: every other
+  socket in the process (discord.py gateway and REST, aiohttp) resolves
+  normally.
+
+warm() resolves WARM_HOSTS and opens a connection to each on startup, so the
+first job after boot doesn't pay the handshakes either. stats() reports pool
+and DNS hits/misses; close_all() closes the shared pools at shutdown.
+
+This hooks private parts of yt-dlp (RequestsRH._create_instance) and urllib3
+(HTTPConnection._dns_host), written against the versions pinned in
+requirements.txt (yt-dlp 2026.08.19, urllib3 2.8.0). Re-check both when
+bumping them; install() backs off if the yt-dlp hook is gone.
+"""
+import os
+import time
+import socket
+import asyncio
+import threading
+from collections import OrderedDict
+
+HTTP_POOL_HOSTS = int(os.getenv("HTTP_POOL_HOSTS", "32"))
+HTTP_POOL_PER_HOST = int(os.getenv("HTTP_POOL_PER_HOST", "8"))
+DNS_CACHE_TTL = float(os.getenv("DNS_CACHE_TTL", "300"))  # 0 disables the DNS cache
+DNS_CACHE_MAX = 512
+WARM_HOSTS = [h.strip() for h in os.getenv("WARM_HOSTS", "www.youtube.com,www.instagram.com").split(",") if h.strip()]
+
+_lock = threading.Lock()
+_adapters = {}  # TLS profile -> shared adapter
+_installed = False
+
+# --- DNS ---------------------------------------------------------------------
+
+_dns = OrderedDict()  # getaddrinfo args -> (expires, result)
+_dns_hits = 0
+_dns_misses = 0
+
+def _cached_getaddrinfo(host, port, family=0, type=0, proto=0, flags=0):
+    global _dns_hits, _dns_misses
+    key = (host, port, family, type, proto, flags)
+    now = time.monotonic()
+    with _lock:
+        hit = _dns.get(key)
+        if hit and hit[0] > now:
+            _dns.move_to_end(key)
+            _dns_hits += 1
+            return list(hit[1])
+        _dns_misses += 1
+    result = socket.getaddrinfo(host, port, family, type, proto, flags)
+    with _lock:
+        _dns[key] = (now + DNS_CACHE_TTL, result)
+        _dns.move_to_end(key)
+        while len(_dns) > DNS_CACHE_MAX:
+            _dns.popitem(last=False)
+    return list(result)
+
+# --- connection pools --------------------------------------------------------
+
+_pool_classes = None
+_adapter_class = None
+
+def _cached_dns_pools() -> dict:
+    """urllib3 pool classes whose connections resolve through _cached_getaddrinfo."""
+    global _pool_classes
+    if _pool_classes is not None:
+        return _pool_classes
+    import urllib3
+    from urllib3.connection import HTTPConnection, HTTPSConnection
+    from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+
+    class _CachedDNS:
+        def _new_conn(self):
+            host = self._dns_host
+            try:
+                addrs = _cached_getaddrinfo(host, self.port, 0, socket.SOCK_STREAM)
+            except OSError:
+                return super()._new_conn()  # urllib3 raises its own resolution error
+            err = None
+            # Connect to the cached addresses; TLS still checks against self.host
+            for addr in dict.fromkeys(a[4][0] for a in addrs):
+                self._dns_host = addr
+                try:
+                    return super()._new_conn()
+                except (NewConnectionError, ConnectTimeoutError) as e:
+                    err = e
+                finally:
+                    self._dns_host = host
+            if err is None:
+                return super()._new_conn()
+            raise err
+
+    class _HTTPConnection(_CachedDNS, HTTPConnection):
+        pass
+
+    class _HTTPSConnection(_CachedDNS, HTTPSConnection):
+        pass
+
+    class _HTTPConnectionPool(urllib3.HTTPConnectionPool):
+        ConnectionCls = _HTTPConnection
+
+    class _HTTPSConnectionPool(urllib3.HTTPSConnectionPool):
+        ConnectionCls = _HTTPSConnection
+
+    _pool_classes = {"http": _HTTPConnectionPool, "https": _HTTPSConnectionPool}
+    return _pool_classes
+
+def _shared_adapter_class():
+    """RequestsHTTPAdapter that outlives the sessions it's mounted on."""
+    global _adapter_class
+    if _adapter_class is not None:
+        return _adapter_class
+    from yt_dlp.networking._requests import RequestsHTTPAdapter
+
+    class _SharedAdapter(RequestsHTTPAdapter):
+        def close(self):
+            pass  # sessions come and go, the pools stay until close_all()
+
+        def shutdown(self):
+            super().close()
+
+    _adapter_class = _SharedAdapter
+    return _adapter_class
+
+def _shared_adapter(rh, legacy_ssl_support):
+    """One adapter per TLS profile of a RequestsRH; created on first use."""
+    import urllib3
+
+    key = (
+        rh.verify, rh.prefer_system_certs, bool(legacy_ssl_support),
+        tuple(sorted(rh._client_cert.items())), rh.source_address,
+    )
+    with _lock:
+        adapter = _adapters.get(key)
+        if adapter is None:
+            adapter = _shared_adapter_class()(
+                ssl_context=rh._make_sslcontext(legacy_ssl_support=legacy_ssl_support),
+                source_address=rh.source_address,
+                max_retries=urllib3.util.retry.Retry(False),
+                pool_connections=HTTP_POOL_HOSTS,
+                pool_maxsize=HTTP_POOL_PER_HOST,
+            )
+            if DNS_CACHE_TTL > 0:
+                adapter.poolmanager.pool_classes_by_scheme = _cached_dns_pools()
+            _adapters[key] = adapter
+        return adapter
+
+def install() -> bool:
+    """Share connection pools between all YoutubeDL instances of this process.
+
+    Called right after yt_dlp is imported (in every worker process too).
+    Returns False when yt-dlp isn't using `requests` and nothing was changed.
+    """
+    global _installed
+    with _lock:
+        if _installed:
+            return True
+        _installed = True
+    try:
+        from yt_dlp.networking import _requests
+    except ImportError as e:
+        print(f"[WARN][HttpPool] requests not available, yt-dlp falls back to per-request connections: {e}")
+        return False
+    if not hasattr(_requests.RequestsRH, "_create_instance"):
+        print("[WARN][HttpPool] unsupported yt-dlp version, connection pools are not shared")
+        return False
+
+    original = _requests.RequestsRH._create_instance
+
+    def _create_instance(self, cookiejar, legacy_ssl_support=None):
+        session = original(self, cookiejar, legacy_ssl_support=legacy_ssl_support)
+        adapter = _shared_adapter(self, legacy_ssl_support)
+        session.adapters.clear()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    _requests.RequestsRH._create_instance = _create_instance
+    return True
+
+def _warm_host(ydl, host: str) -> None:
+    from yt_dlp.networking import Request
+    _cached_getaddrinfo(host, 443, 0, socket.SOCK_STREAM)
+    ydl.urlopen(Request(f"https://{host}/", method="HEAD")).close()
+
+async def warm(hosts=None) -> float:
+    """Resolve and connect to `hosts` (WARM_HOSTS) off the loop; returns seconds taken.
+
+    yt_dlp must already be imported (downloader.prewarm()).
+    """
+    import yt_dlp
+
+    t0 = time.perf_counter()
+    ydl = yt_dlp.YoutubeDL({"quiet": True, "no_warnings": True})
+    try:
+        results = await asyncio.gather(
+            *(asyncio.to_thread(_warm_host, ydl, h) for h in (hosts or WARM_HOSTS)),
+            return_exceptions=True,
+        )
+    finally:
+        ydl.close()
+    for host, r in zip(hosts or WARM_HOSTS, results):
+        if isinstance(r, Exception):
+            print(f"[WARN][HttpPool] warm-up of {host} failed: {r!r}")
+    return time.perf_counter() - t0
+
+def close_all() -> None:
+    """Close every shared pool (bot shutdown). Later requests start new ones."""
+    with _lock:
+        adapters = list(_adapters.values())
+        _adapters.clear()
+    for adapter in adapters:
+        adapter.shutdown()
+
+def stats() -> dict:
+    """Connections opened vs requests served from the shared pools, and DNS hits."""
+    requests = opened = hosts = 0
+    with _lock:
+        adapters = list(_adapters.values())
+    for adapter in adapters:
+        pools = adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            hosts += 1
+            requests += pool.num_requests
+            opened += pool.num_connections
+    return {
+        "hosts": hosts,
+        "requests": requests,
+        "pool_hits": max(0, requests - opened),
+        "pool_misses": opened,
+        "dns_hits": _dns_hits,
+        "dns_misses": _dns_misses,
+    }
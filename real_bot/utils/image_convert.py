@@ -0,0 +1,262 @@
+# real_bot/utils/image_convert.py
+"""
+Image conversion for !convert: every attachment of the message, in parallel,
+off the event loop and within memory caps.
+
+Inputs: JPEG, WebP, and HEIF/HEIC when pillow-heif is installed. Targets:
+PNG or WebP (TARGETS).
+
+Per attachment:
+
+- the file is streamed from the CDN in chunks to the job's directory; each
+  chunk is written (and the header probed from the first ones) in a thread
+  while the next one downloads, so an image over CONVERT_MAX_PIXELS is
+  rejected before the rest is fetched;
+- its estimated bitmap memory is reserved from a shared budget
+  (CONVERT_MEMORY_BUDGET), so a burst of large photos queues instead of
+  piling up in RAM;
+- decode + encode run in a process pool (CONVERT_WORKERS, see procpool.py),
+  so a batch uses several cores and a crashing native decoder only takes
+  down a worker. While one file converts the next ones are still downloading.
+"""
+import io
+import os
+import time
+import asyncio
+
+import aiohttp
+from PIL import Image
+
+from real_bot.utils.procpool import ProcessPool
+
+try:
+    import pillow_heif
+    pillow_heif.register_heif_opener()  # also runs in each worker, on import
+    HEIF = True
+except ImportError:
+    HEIF = False
+
+CONVERT_MAX_BYTES = int(os.getenv("CONVERT_MAX_BYTES", str(25 * 1024 * 1024)))
+CONVERT_MAX_PIXELS = int(os.getenv("CONVERT_MAX_PIXELS", str(50_000_000)))
+CONVERT_MEMORY_BUDGET = int(os.getenv("CONVERT_MEMORY_BUDGET", str(512 * 1024 * 1024)))
+CONVERT_WORKERS = int(os.getenv("CONVERT_WORKERS", "2"))
+CONVERT_WORKER_MAX_JOBS = int(os.getenv("CONVERT_WORKER_MAX_JOBS", "200"))
+CONVERT_PNG_LEVEL = int(os.getenv("CONVERT_PNG_LEVEL", "6"))
+CONVERT_WEBP_QUALITY = int(os.getenv("CONVERT_WEBP_QUALITY", "90"))
+CHUNK_SIZE = 256 * 1024
+HEADER_PROBE_FIRST = 16 * 1024  # first header probe; each next one waits for twice as much
+HEADER_PROBE_BYTES = 2 * 1024 * 1024  # stop probing here; the file is probed once it's complete
+
+TARGETS = {"png": ("PNG", ".png"), "webp": ("WEBP", ".webp")}
+SOURCE_EXTS = {".jpg": "JPEG", ".jpeg": "JPEG", ".webp": "WebP", ".heic": "HEIF", ".heif": "HEIF"}
+SOURCE_TYPES = {"image/jpeg": "JPEG", "image/webp": "WebP", "image/heic": "HEIF", "image/heif": "HEIF"}
+
+CONVERT_POOL = ProcessPool(size=CONVERT_WORKERS, max_jobs=CONVERT_WORKER_MAX_JOBS, name="ConvertPool")
+_session = None
+
+class ConvertError(Exception):
+    """Shown to the user as is."""
+
+class MemoryBudget:
+    """Bytes of decoded bitmaps allowed in flight; jobs wait for room."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.used = 0
+        self._cond = asyncio.Condition()
+
+    async def acquire(self, n: int) -> int:
+        n = min(n, self.limit)  # one oversized job may still run alone
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.used + n <= self.limit)
+            self.used += n
+        return n
+
+    async def release(self, n: int) -> None:
+        async with self._cond:
+            self.used -= n
+            self._cond.notify_all()
+
+_BUDGET = None
+
+def _budget() -> MemoryBudget:
+    global _BUDGET
+    if _BUDGET is None:
+        _BUDGET = MemoryBudget(CONVERT_MEMORY_BUDGET)  # its Condition binds to the running loop
+    return _BUDGET
+
+def _http() -> aiohttp.ClientSession:
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=120))
+    return _session
+
+async def close() -> None:
+    """Close the shared CDN session (cog unload / shutdown)."""
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+def source_format(attachment):
+    """Input format name of `attachment` by extension or content type, or None if unsupported."""
+    ext = os.path.splitext(attachment.filename.lower())[1]
+    ctype = (attachment.content_type or "").lower().split(";")[0]
+    fmt = SOURCE_EXTS.get(ext) or SOURCE_TYPES.get(ctype)
+    if fmt == "HEIF" and not HEIF:
+        return None
+    return fmt
+
+def output_names(filenames, target: str) -> list:
+    """Output file name per input, with the target extension; duplicates get a suffix."""
+    ext = TARGETS[target][1]
+    seen, names = set(), []
+    for filename in filenames:
+        stem = os.path.splitext(os.path.basename(filename))[0] or "image"
+        name, n = stem + ext, 1
+        while name.lower() in seen:
+            n += 1
+            name = f"{stem}_{n}{ext}"
+        seen.add(name.lower())
+        names.append(name)
+    return names
+
+def _header(data) -> tuple:
+    """(width, height, bands) from the start of an image, or None if not there yet."""
+    try:
+        with Image.open(io.BytesIO(data) if isinstance(data, (bytes, bytearray)) else data) as im:
+            return im.width, im.height, len(im.getbands())
+    except Exception:
+        return None
+
+def _bitmap_bytes(header) -> int:
+    # decoded image + the copy convert() may make
+    w, h, bands = header
+    return w * h * max(bands, 3) * 2
+
+def _check_pixels(header) -> None:
+    w, h, _ = header
+    if w * h > CONVERT_MAX_PIXELS:
+        raise ConvertError(f"That image is too large to convert ({w}×{h} pixels).")
+
+def _convert_file(src: str, dst: str, target: str) -> float:
+    """Decode `src` and write it to `dst` in `target`; returns the seconds spent. Runs in a worker."""
+    start = time.perf_counter()
+    fmt = TARGETS[target][0]
+    try:
+        with Image.open(src) as im:
+            if im.width * im.height > CONVERT_MAX_PIXELS:
+                raise ConvertError(f"That image is too large to convert ({im.width}×{im.height} pixels).")
+            alpha = "A" in im.getbands() or "transparency" in im.info
+            keep = ("RGBA", "LA", "RGB", "L") if fmt == "PNG" else ("RGBA", "RGB")
+            image = im if im.mode in keep else im.convert("RGBA" if alpha else "RGB")
+            if fmt == "PNG":
+                image.save(dst, format="PNG", compress_level=CONVERT_PNG_LEVEL)
+            else:
+                image.save(dst, format="WEBP", quality=CONVERT_WEBP_QUALITY, method=4)
+    except (OSError, SyntaxError, ValueError, Image.DecompressionBombError) as e:
+        raise ConvertError("That image couldn't be decoded.") from e
+    return time.perf_counter() - start
+
+def _store(f, chunk: bytes, head, probe: bool):
+    """Write a chunk, keeping it in `head` for the header probe; returns the header if probed and found.
+
+    Runs in a thread, one chunk at a time, while the next chunk downloads.
+    """
+    f.write(chunk)
+    if head is None:
+        return None
+    head += chunk
+    return _header(head) if probe else None
+
+async def _fetch(attachment, src: str) -> tuple:
+    """Stream `attachment` to `src`; returns its header, probed as early as possible."""
+    if attachment.size and attachment.size > CONVERT_MAX_BYTES:
+        raise ConvertError(f"That file is too large to convert (max {CONVERT_MAX_BYTES // (1024 * 1024)} MB).")
+    head, header, received = bytearray(), None, 0
+    kept, next_probe = 0, HEADER_PROBE_FIRST
+    storing = None  # the previous chunk's write (+ probe)
+
+    async def settle():
+        nonlocal storing, header
+        if storing is None:
+            return
+        found, storing = await storing, None
+        if header is None and found is not None:
+            header = found
+            _check_pixels(header)  # the rest is never fetched
+
+    async with _http().get(attachment.url) as resp:
+        resp.raise_for_status()
+        with open(src, "wb") as f:
+            try:
+                async for chunk in resp.content.iter_chunked(CHUNK_SIZE):
+                    received += len(chunk)
+                    if received > CONVERT_MAX_BYTES:
+                        raise ConvertError(f"That file is too large to convert (max {CONVERT_MAX_BYTES // (1024 * 1024)} MB).")
+                    await settle()
+                    keep = header is None and kept < HEADER_PROBE_BYTES
+                    probe = False
+                    if keep:
+                        kept += len(chunk)
+                        # Re-parsing the whole prefix each chunk is quadratic; doubling
+                        # thresholds keep the total probe work linear in the prefix
+                        if kept >= next_probe or kept >= HEADER_PROBE_BYTES:
+                            next_probe = 2 * kept
+                            probe = True
+                    storing = asyncio.ensure_future(asyncio.to_thread(_store, f, chunk, head if keep else None, probe))
+                await settle()
+            finally:
+                if storing is not None:
+                    await asyncio.wait([storing])  # don't close the file under a running write
+    if header is None:
+        header = await asyncio.to_thread(_header, src)
+    if header is None:
+        raise ConvertError("That file isn't an image I can read.")
+    _check_pixels(header)
+    return header
+
+async def convert_attachment(attachment, job_dir: str, name: str, target: str = "png") -> tuple:
+    """Fetch `attachment` into `job_dir` and convert it to `job_dir/name`.
+
+    Returns (output path, seconds for this file). Raises ConvertError for
+    anything the user should hear about (too big, not an image).
+    """
+    start = time.perf_counter()
+    src = os.path.join(job_dir, f"src_{attachment.id}")
+    dst = os.path.join(job_dir, name)
+    budget = _budget()
+    try:
+        header = await _fetch(attachment, src)
+        reserved = await budget.acquire(_bitmap_bytes(header))
+        try:
+            await CONVERT_POOL.run(_convert_file, src, dst, target)
+        finally:
+            await budget.release(reserved)
+    finally:
+        try:
+            os.remove(src)
+        except OSError:
+            pass
+    return dst, time.perf_counter() - start
+
+async def convert_batch(attachments, job_dir: str, target: str = "png") -> list:
+    """Convert all `attachments` concurrently.
+
+    Returns one (attachment, output path or None, seconds, error or None)
+    per attachment, in order; one bad file doesn't fail the rest.
+    """
+    names = output_names([a.filename for a in attachments], target)
+
+    async def one(attachment, name):
+        start = time.perf_counter()
+        try:
+            path, took = await convert_attachment(attachment, job_dir, name, target)
+            return attachment, path, took, None
+        except ConvertError as e:
+            return attachment, None, time.perf_counter() - start, str(e)
+        except Exception as e:
+            print(f"[ERROR][Convert] {attachment.filename} failed: {e!r}")
+            return attachment, None, time.perf_counter() - start, "Conversion failed."
+
+    return list(await asyncio.gather(*(one(a, n) for a, n in zip(attachments, names))))
@@ -0,0 +1,101 @@
+# real_bot/utils/limits.py
+"""
+Discord upload limits, and fitting yt-dlp format selection to them.
+
+A file we can't deliver is wasted bandwidth and a wasted scheduler slot, so
+the downloader cogs check the probed formats against the limit *before*
+downloading and narrow their format selector to what fits:
+
+    limit = upload_limit(None)                 # files are DMed to the user
+    check_fits(info, limit, REEL_FORMAT)       # raises TooLarge, nothing fetched
+    opts["format"] = fit_format(REEL_FORMAT, limit)
+
+Size estimates per format, best first: `filesize` (exact), `filesize_approx`,
+then `tbr` x duration — yt-dlp fills the last into filesize_approx itself
+while selecting, so the selector only has to filter on the first two.
+"""
+import os
+
+import discord
+
+from real_bot.utils.downloader import selects_any
+
+DM_FILESIZE_LIMIT = int(os.getenv("DM_FILESIZE_LIMIT", str(discord.utils.DEFAULT_FILE_SIZE_LIMIT_BYTES)))
+
+# Room for the multipart envelope, and for approximate sizes being optimistic.
+EXACT_HEADROOM = 64 * 1024
+APPROX_FACTOR = 0.92
+
+def upload_limit(guild) -> int:
+    """Largest attachment we can send to `guild` (None = a DM; media always goes to DMs)."""
+    if guild is None:
+        return DM_FILESIZE_LIMIT
+    return guild.filesize_limit
+
+class TooLarge(Exception):
+    def __init__(self, limit: int, smallest=None):
+        self.limit = limit
+        self.smallest = smallest
+        super().__init__(f"no format fits in {limit} bytes (smallest ~{smallest})")
+
+def estimate_size(fmt: dict, duration=None):
+    """Best guess of a format's size in bytes, or None if there's nothing to go on."""
+    size = fmt.get("filesize") or fmt.get("filesize_approx")
+    if size:
+        return size
+    tbr = fmt.get("tbr")
+    if tbr and duration:
+        return int(tbr * 1000 / 8 * duration)
+    return None
+
+def check_fits(info: dict, limit: int, selector: str) -> None:
+    """Raise TooLarge when fit_format(selector, limit) can't pick any format of a probed info dict.
+
+    yt-dlp's own selector decides, so formats `selector` would never take
+    (video-only or audio-only ones, another ext) don't count. Sizes are
+    estimated as in estimate_size; formats without any estimate count as
+    "might fit", so an extractor that reports no sizes never gets rejected
+    here. Blocking the first time (see selects_any); run it off the loop.
+    """
+    if not limit:
+        return
+    duration = info.get("duration")
+    formats = []
+    for f in info.get("formats") or [info]:
+        # storyboards / thumbnails-as-formats carry no media and no size
+        if (f.get("vcodec") == "none" and f.get("acodec") == "none") or f.get("ext") == "mhtml":
+            continue
+        if not (f.get("filesize") or f.get("filesize_approx")):
+            f = dict(f, filesize_approx=estimate_size(f, duration))
+        formats.append(f)
+    if not formats or selects_any(fit_format(selector, limit), formats):
+        return
+    sizes = [s for s in (estimate_size(f, duration) for f in formats) if s]
+    raise TooLarge(limit, min(sizes) if sizes else None)
+
+def fit_format(selector: str, limit: int) -> str:
+    """Narrow a yt-dlp format selector to formats that fit in `limit` bytes.
+
+    Each "/"-alternative is tried with an exact size first, then an
+    approximate one, then among formats that report no size at all (which
+    might fit, as in check_fits); merged alternatives ("a+b") are left as
+    they are. A format known to be too large is never picked.
+    """
+    if not limit:
+        return selector
+    exact = limit - EXACT_HEADROOM
+    approx = int(limit * APPROX_FACTOR)
+    out = []
+    for alt in selector.split("/"):
+        alt = alt.strip()
+        if "+" in alt:
+            out.append(alt)
+            continue
+        out.append(f"{alt}[filesize<={exact}]")
+        out.append(f"{alt}[filesize_approx<={approx}]")
+        out.append(f"{alt}[filesize<=?{exact}][filesize_approx<=?{approx}]")
+    return "/".join(out)
+
+def is_format_unavailable(err: Exception) -> bool:
+    """yt-dlp's "Requested format is not available" — what a fitted selector raises when nothing fits."""
+    return "Requested format is not available" in str(err)
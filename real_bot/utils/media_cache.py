@@ -0,0 +1,197 @@
+# real_bot/utils/media_cache.py
+"""
+Persistent, size-bounded cache of finished downloads.
+
+Entries are content-addressed by (site, media id, format selector,
+postprocessor profile): the same link asked for the same way maps to the
+same directory, so a repeat request can be uploaded straight from disk
+without running yt-dlp at all.
+
+Layout:  MEDIA_CACHE_DIR/<sha256 of the key>/<original file name>
+
+Publishing copies the file into a private temp dir inside the cache and then
+renames that dir into place, so readers only ever see complete entries.
+Eviction is LRU on the entry dir's mtime (bumped on every hit) and runs after
+each publish until the cache is back under MEDIA_CACHE_BYTES.
+
+A cached path handed out by lookup/publish is pinned: eviction skips it
+until the caller is done delivering it and calls release(path).
+
+lookup/publish touch the disk (the first call also scans the whole cache),
+so the cogs call them through asyncio.to_thread. release() is cheap and is
+called from the loop; an eviction it triggers is deleted in a thread.
+"""
+import asyncio
+import os
+import uuid
+import shutil
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from real_bot.utils.downloader import media_key
+
+MEDIA_CACHE_DIR = Path(os.getenv("MEDIA_CACHE_DIR", str(Path(__file__).resolve().parent.parent / "cache" / "media")))
+MEDIA_CACHE_BYTES = int(os.getenv("MEDIA_CACHE_BYTES", str(2 * 1024 ** 3)))  # 0 disables the cache
+
+def cache_key(url: str, fmt: str, pp_profile: str = "none"):
+    """Content address for url downloaded with `fmt` + `pp_profile`, or None if url isn't canonicalisable."""
+    mkey = media_key(url)
+    if mkey is None:
+        return None
+    return hashlib.sha256(f"{mkey}|{fmt}|{pp_profile}".encode("utf-8")).hexdigest()
+
+def _entry_size(path: Path) -> int:
+    total = 0
+    for f in path.iterdir():
+        try:
+            total += f.stat().st_size
+        except OSError:
+            pass
+    return total
+
+class MediaCache:
+    def __init__(self, root: Path = MEDIA_CACHE_DIR, budget: int = MEDIA_CACHE_BYTES):
+        self.root = Path(root)
+        self.budget = budget
+        self._lru = None  # OrderedDict[key, size], oldest first; built lazily from disk
+        self._bytes = 0
+        self._pins = {}  # key -> paths handed out and not yet released
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.budget > 0
+
+    def _index(self):
+        if self._lru is None:
+            self.root.mkdir(parents=True, exist_ok=True)
+            entries = []
+            for d in self.root.iterdir():
+                if not d.is_dir():
+                    continue
+                if d.name.startswith("tmp-"):
+                    shutil.rmtree(d, ignore_errors=True)  # leftover from a crash mid-publish
+                    continue
+                try:
+                    entries.append((d.stat().st_mtime, d.name, _entry_size(d)))
+                except OSError:
+                    continue
+            entries.sort()
+            self._lru = OrderedDict((name, size) for _, name, size in entries)
+            self._bytes = sum(self._lru.values())
+        return self._lru
+
+    def _pin(self, key, path) -> str:
+        self._pins[key] = self._pins.get(key, 0) + 1
+        return str(path)
+
+    def lookup(self, key):
+        """Path of the cached file for key, or None. Counts as a use for LRU.
+
+        The path is pinned against eviction; release() it after delivery.
+        """
+        if not self.enabled or key is None:
+            return None
+        with self._lock:
+            lru = self._index()
+            if key not in lru:
+                return None
+            entry = self.root / key
+            files = [f for f in entry.iterdir() if f.is_file()] if entry.is_dir() else []
+            if not files:
+                self._bytes -= lru.pop(key)
+                return None
+            lru.move_to_end(key)
+            try:
+                os.utime(entry)
+            except OSError:
+                pass
+            return self._pin(key, files[0])
+
+    def publish(self, key, src: str) -> str:
+        """Copy a finished download into the cache and return the cached path.
+
+        Returns `src` unchanged when caching is off or the file can never fit.
+        A cached path is pinned like lookup's; release() it after delivery.
+        """
+        if not self.enabled or key is None or not os.path.exists(src):
+            return src
+        size = os.path.getsize(src)
+        if size > self.budget:
+            return src
+        with self._lock:
+            lru = self._index()
+            if key in lru:
+                existing = self.root / key
+                files = [f for f in existing.iterdir() if f.is_file()] if existing.is_dir() else []
+                if files:
+                    return self._pin(key, files[0])
+                self._bytes -= lru.pop(key)
+        tmp = self.root / f"tmp-{uuid.uuid4().hex}"
+        tmp.mkdir(parents=True)
+        try:
+            shutil.copy2(src, tmp / os.path.basename(src))
+            os.replace(tmp, self.root / key)
+        except OSError:
+            # Lost a race with another publisher (or the disk is full): keep serving src.
+            shutil.rmtree(tmp, ignore_errors=True)
+            return self.lookup(key) or src
+        with self._lock:
+            self._lru[key] = size
+            self._bytes += size
+            path = self._pin(key, self.root / key / os.path.basename(src))
+            victims = self._evict()
+        _remove(victims)
+        return path
+
+    def release(self, path) -> None:
+        """Unpin a path from lookup/publish; anything else (or None) is ignored."""
+        if not path:
+            return
+        entry = Path(path).parent
+        if entry.parent != self.root:
+            return
+        with self._lock:
+            count = self._pins.get(entry.name, 0)
+            if count > 1:
+                self._pins[entry.name] = count - 1
+                return
+            if not count:
+                return
+            del self._pins[entry.name]
+            victims = self._evict()  # may have been kept over budget while pinned
+        if not victims:
+            return
+        try:
+            asyncio.get_running_loop().run_in_executor(None, _remove, victims)
+        except RuntimeError:  # not on the loop
+            _remove(victims)
+
+    def _evict(self) -> list:
+        """Drop entries from the index until under budget; returns their dirs to delete.
+
+        Oldest first, skipping entries still being delivered; the newest
+        entry always stays. Deleting is left to the caller, outside the lock.
+        """
+        victims = []
+        for key in list(self._lru):
+            if self._bytes <= self.budget or len(self._lru) <= 1:
+                break
+            if key in self._pins:
+                continue
+            self._bytes -= self._lru.pop(key)
+            victims.append(self.root / key)
+        return victims
+
+    def stats(self) -> dict:
+        with self._lock:
+            lru = self._index() if self.enabled else {}
+            return {"entries": len(lru), "bytes": self._bytes, "budget": self.budget}
+
+def _remove(dirs) -> None:
+    for d in dirs:
+        shutil.rmtree(d, ignore_errors=True)
+
+MEDIA_CACHE = MediaCache()
@@ -0,0 +1,93 @@
+# real_bot/utils/procpool.py
+"""
+Long-lived worker processes for yt-dlp jobs (opt-in: YTDLP_EXECUTOR=process).
+
+Extraction is regex/JSON/JS heavy pure Python; in threads it fights the
+discord.py gateway loop for the GIL. In this mode probe() and downloads run
+in a small spawn-started process pool instead, and only the raw info dict or
+(file path, slim info) comes back over the pipe.
+
+- YTDLP_WORKERS processes (default 2).
+- Recycling: after YTDLP_WORKER_MAX_JOBS jobs per worker on average the pool
+  is swapped for a fresh one; running jobs finish in the old pool.
+- Crash isolation: a worker dying (segfault in a native lib, OOM kill) breaks
+  only the pool, not the bot. The pool is rebuilt and the job retried once.
+"""
+import os
+import atexit
+import asyncio
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+YTDLP_EXECUTOR = os.getenv("YTDLP_EXECUTOR", "thread").lower()  # "thread" | "process"
+YTDLP_WORKERS = int(os.getenv("YTDLP_WORKERS", "2"))
+YTDLP_WORKER_MAX_JOBS = int(os.getenv("YTDLP_WORKER_MAX_JOBS", "25"))
+
+class ProcessPool:
+    def __init__(self, size: int = YTDLP_WORKERS, max_jobs: int = YTDLP_WORKER_MAX_JOBS, name: str = "ProcPool"):
+        self.size = max(1, size)
+        self.max_jobs = max(1, max_jobs)
+        self.name = name
+        self._executor = None
+        self._jobs = 0
+        self._generation = 0
+        self._restarts = 0
+        self._lock = threading.Lock()
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        # spawn, not fork: the parent has live threads (journal writer, to_thread workers)
+        ctx = multiprocessing.get_context("spawn")
+        self._generation += 1
+        self._jobs = 0
+        return ProcessPoolExecutor(max_workers=self.size, mp_context=ctx)
+
+    def _acquire(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = self._new_executor()
+            elif self._jobs >= self.size * self.max_jobs:
+                old, self._executor = self._executor, self._new_executor()
+                old.shutdown(wait=False)
+                print(f"[DEBUG][{self.name}] Recycled workers (generation {self._generation})")
+            self._jobs += 1
+            return self._executor
+
+    def _replace_broken(self, broken: ProcessPoolExecutor) -> None:
+        with self._lock:
+            if self._executor is broken:
+                self._restarts += 1
+                self._executor = self._new_executor()
+                print(f"[WARN][{self.name}] Worker crashed; pool restarted ({self._restarts} so far)")
+        broken.shutdown(wait=False)
+
+    async def run(self, fn, *args):
+        """Run fn(*args) in a worker; fn and args must be picklable (module-level fn)."""
+        loop = asyncio.get_running_loop()
+        for attempt in (1, 2):
+            executor = self._acquire()
+            try:
+                return await loop.run_in_executor(executor, fn, *args)
+            except BrokenProcessPool:
+                self._replace_broken(executor)
+                if attempt == 2:
+                    raise
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "generation": self._generation,
+            "jobs_this_generation": self._jobs,
+            "restarts": self._restarts,
+        }
+
+YTDLP_POOL = ProcessPool(name="YtdlpPool") if YTDLP_EXECUTOR == "process" else None
+if YTDLP_POOL is not None:
+    atexit.register(YTDLP_POOL.shutdown)
@@ -0,0 +1,196 @@
+# real_bot/utils/progress.py
+"""
+Live job progress in the status message, without burning REST budget.
+
+yt-dlp calls progress hooks many times a second from the download thread.
+JobProgress turns them into events for one job (keyed like DOWNLOADS, so
+everyone sharing a coalesced download sees it move); each watching
+StatusEditor renders them into its message:
+
+    📥 Downloading reel… ▰▰▰▰▱▱▱▱▱▱ 42% · 3.1 MB/s · ETA 0:05
+
+Edits are coalesced, latest text wins:
+
+- at most one edit per message every PROGRESS_EDIT_INTERVAL seconds;
+- edits in one channel share that channel's rate-limit bucket (Discord
+  allows about 5 per 5 s), so several jobs in one channel space themselves
+  PROGRESS_CHANNEL_SPACING apart; if a 429 happens anyway, discord.py waits
+  it out inside edit() while newer text keeps replacing the pending one;
+- an unchanged text is never sent.
+
+Final states (errors) go through finish(), which drops anything pending so a
+late progress edit can't overwrite them.
+"""
+import os
+import time
+import asyncio
+from collections import defaultdict
+from contextlib import contextmanager
+
+import discord
+
+PROGRESS_EDIT_INTERVAL = float(os.getenv("PROGRESS_EDIT_INTERVAL", "3"))
+PROGRESS_CHANNEL_SPACING = float(os.getenv("PROGRESS_CHANNEL_SPACING", "1.2"))
+HOOK_MIN_INTERVAL = 0.5  # hook calls forwarded to the loop per job, at most every this many s
+
+_channel_next = {}  # channel id -> monotonic time the channel's next edit may go out
+
+def _claim(channel, not_before: float) -> float:
+    """Book the channel's next edit at or after `not_before`; returns when it may go out."""
+    now = time.monotonic()
+    for cid in [c for c, t in _channel_next.items() if t <= now]:
+        del _channel_next[cid]  # past: no spacing left to keep
+    at = max(not_before, _channel_next.get(channel, 0.0))
+    _channel_next[channel] = at + PROGRESS_CHANNEL_SPACING
+    return at
+
+def _bar(fraction: float, width: int = 10) -> str:
+    filled = max(0, min(width, round(fraction * width)))
+    return "▰" * filled + "▱" * (width - filled)
+
+def _mb(n) -> str:
+    return f"{n / (1024 * 1024):.1f} MB"
+
+def render_download(label: str, d: dict) -> str:
+    """Status text for a yt-dlp "downloading" progress dict."""
+    parts = []
+    done = d.get("downloaded_bytes") or 0
+    total = d.get("total_bytes") or d.get("total_bytes_estimate")
+    if total:
+        frac = min(1.0, done / total)
+        parts.append(f"{_bar(frac)} {frac * 100:.0f}%")
+    elif done:
+        parts.append(_mb(done))
+    if d.get("speed"):
+        parts.append(f"{_mb(d['speed'])}/s")
+    eta = d.get("eta")
+    if eta is not None and total:
+        eta = int(eta)
+        parts.append(f"ETA {eta // 60}:{eta % 60:02d}")
+    return f"{label} {' · '.join(parts)}".rstrip()
+
+def render_postprocess(name: str) -> str:
+    if name == "Merger":
+        return "🔗 Merging video and audio…"
+    if "Audio" in name or "MP3" in name:
+        return "🎵 Converting audio…"
+    return f"🛠️ Finishing up ({name})…"
+
+class StatusEditor:
+    """Coalescing editor for one status message; its methods run on the loop."""
+
+    def __init__(self, message, label: str, interval: float = PROGRESS_EDIT_INTERVAL):
+        self.message = message
+        self.label = label
+        self.interval = interval
+        self._shown = label
+        self._pending = None
+        self._last = 0.0
+        self._task = None
+        self._closed = False
+
+    def set(self, text: str) -> None:
+        """Show `text` soon; replaces whatever was waiting to be shown."""
+        if self._closed:
+            return
+        self._pending = text
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._flush())
+
+    def progress(self, d: dict) -> None:
+        self.set(render_download(self.label, d))
+
+    def postprocessing(self, name: str) -> None:
+        self.set(render_postprocess(name))
+
+    async def on_position(self, pos: int) -> None:
+        """SCHEDULER on_position callback: queue position, then back to the label."""
+        self.set(f"⏳ Waiting… you're #{pos} in line" if pos else self.label)
+
+    async def _flush(self) -> None:
+        channel = getattr(self.message.channel, "id", None)
+        while not self._closed and self._pending is not None and self._pending != self._shown:
+            now = time.monotonic()
+            at = _claim(channel, max(now, self._last + self.interval))
+            if at > now:
+                await asyncio.sleep(at - now)
+            if self._closed:
+                return
+            text, self._pending = self._pending, None
+            try:
+                await self.message.edit(content=text)
+                self._shown = text
+            except discord.NotFound:
+                self._closed = True  # status was deleted
+                return
+            except discord.HTTPException as e:
+                print(f"[DEBUG][Progress] status edit failed: {e!r}")
+            self._last = time.monotonic()
+
+    def close(self) -> None:
+        """Stop editing (the status is about to be deleted or replaced)."""
+        self._closed = True
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+
+    async def finish(self, text: str):
+        """Edit to a final `text` right away, dropping pending progress."""
+        self.close()
+        return await self.message.edit(content=text)
+
+_watchers = defaultdict(list)  # job key -> [StatusEditor]
+
+@contextmanager
+def watch(key, editor: StatusEditor):
+    """Show progress of the job `key` in `editor` while inside the block.
+
+    A None key (no cache key for the link) isn't shared, so nothing is shown.
+    """
+    if key is None:
+        yield editor
+        return
+    _watchers[key].append(editor)
+    try:
+        yield editor
+    finally:
+        _watchers[key].remove(editor)
+        if not _watchers[key]:
+            del _watchers[key]
+
+def _publish(key, method: str, arg) -> None:
+    for editor in list(_watchers.get(key, ())):
+        getattr(editor, method)(arg)
+
+class JobProgress:
+    """yt-dlp hooks for one job; forwards (throttled) events to the job's watchers.
+
+    Create it on the loop; the hooks themselves run in the download thread.
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self.loop = asyncio.get_running_loop()
+        self._last = 0.0
+
+    def hooks(self) -> dict:
+        """ydl_opts entries to merge into a job's options."""
+        return {"progress_hooks": [self.on_download], "postprocessor_hooks": [self.on_postprocess]}
+
+    def _send(self, method: str, arg) -> None:
+        self.loop.call_soon_threadsafe(_publish, self.key, method, arg)
+
+    def on_download(self, d: dict) -> None:
+        if d.get("status") != "downloading":
+            return
+        now = time.monotonic()
+        if now - self._last < HOOK_MIN_INTERVAL:
+            return
+        self._last = now
+        keys = ("downloaded_bytes", "total_bytes", "total_bytes_estimate", "speed", "eta")
+        self._send("progress", {k: d.get(k) for k in keys})
+
+    def on_postprocess(self, d: dict) -> None:
+        name = d.get("postprocessor") or ""
+        # MoveFiles / Fixup* run on every job and take milliseconds: not worth an edit
+        if d.get("status") == "started" and name != "MoveFiles" and not name.startswith("Fixup"):
+            self._send("postprocessing", name)
@@ -0,0 +1,167 @@
+# real_bot/utils/scheduler.py
+"""
+One download scheduler shared by every downloader cog.
+
+    async with SCHEDULER.slot(guild_id, user_id, cost, on_position=cb):
+        ...download...
+
+- MAX_CONCURRENT slots in total (not per cog). The default, 6, is what
+  the three downloader cogs allowed together when each had its own
+  semaphore of 2.
+- Weighted fair queuing across guilds: each guild's jobs get virtual
+  start/finish tags (start-time fair queuing), so a guild that floods the
+  queue only delays its own later jobs, not everyone else's.
+- At most MAX_JOBS_PER_USER running jobs per user; extra ones wait. A job
+  may bring its own cap (`per_user=`), e.g. the items of one !batch.
+- Fast lane: FAST_LANE_SLOTS slots are kept for jobs whose estimated cost is
+  at most FAST_LANE_COST (seconds of media), so a 10 s Short never sits
+  behind a run of 6-minute audio transcodes.
+- `on_position(n)` is awaited whenever a waiting job's place in line
+  changes, and with 0 once it starts.
+"""
+import os
+import asyncio
+import itertools
+from collections import defaultdict
+from contextlib import asynccontextmanager
+
+MAX_CONCURRENT = int(os.getenv("MAX_CONCURRENT", "6"))
+MAX_JOBS_PER_USER = int(os.getenv("MAX_JOBS_PER_USER", "1"))
+FAST_LANE_SLOTS = int(os.getenv("FAST_LANE_SLOTS", "1"))
+FAST_LANE_COST = float(os.getenv("FAST_LANE_COST", "90"))
+
+# Cost is in seconds of media. Without a duration, a size is turned into
+# seconds at 1 MiB per second of media (about 8 Mbit/s video); low-bitrate
+# media comes out cheaper than it really is.
+_BYTES_PER_COST = 1024 * 1024
+
+def estimate_cost(info) -> float:
+    """Job cost in seconds of media, from a probed info dict.
+
+    The duration when the probe has it; else the size at _BYTES_PER_COST
+    bytes per second; else just over FAST_LANE_COST.
+    """
+    if not info:
+        return FAST_LANE_COST + 1
+    duration = info.get("duration")
+    if duration:
+        return float(duration)
+    size = info.get("filesize") or info.get("filesize_approx")
+    if size:
+        return size / _BYTES_PER_COST
+    return FAST_LANE_COST + 1  # unknown: don't let it into the fast lane
+
+class _Ticket:
+    __slots__ = ("guild", "user", "cost", "fast", "start", "tag", "seq", "future", "on_position", "position", "per_user", "granted")
+
+class JobScheduler:
+    def __init__(self, slots: int = MAX_CONCURRENT, per_user: int = MAX_JOBS_PER_USER,
+                 fast_slots: int = FAST_LANE_SLOTS, fast_cost: float = FAST_LANE_COST):
+        self.slots = max(1, slots)
+        self.per_user = max(1, per_user)
+        self.fast_slots = max(0, min(fast_slots, self.slots - 1))
+        self.fast_cost = fast_cost
+        self._waiting = []
+        self._running = 0
+        self._running_slow = 0
+        self._user_running = defaultdict(int)
+        self._guild_finish = {}
+        self._vtime = 0.0
+        self._seq = itertools.count()
+
+    @asynccontextmanager
+    async def slot(self, guild_id: int, user_id: int, cost: float, on_position=None, per_user: int = None):
+        t = self._enqueue(guild_id, user_id, cost, on_position, per_user)
+        try:
+            await t.future
+        except BaseException:
+            if t.granted:
+                self._release(t)  # granted just as we were cancelled
+            else:
+                if t in self._waiting:
+                    self._waiting.remove(t)
+                self._dispatch()
+            raise
+        try:
+            yield
+        finally:
+            self._release(t)
+
+    def _enqueue(self, guild_id, user_id, cost, on_position, per_user=None) -> _Ticket:
+        t = _Ticket()
+        t.guild, t.user, t.cost = guild_id, user_id, max(0.0, float(cost))
+        t.fast = t.cost <= self.fast_cost
+        t.start = max(self._vtime, self._guild_finish.get(guild_id, 0.0))
+        t.tag = t.start + t.cost
+        self._guild_finish[guild_id] = t.tag
+        t.seq = next(self._seq)
+        t.future = asyncio.get_running_loop().create_future()
+        t.on_position = on_position
+        t.position = None
+        t.per_user = max(1, per_user) if per_user else self.per_user
+        t.granted = False
+        self._waiting.append(t)
+        self._dispatch()
+        return t
+
+    def _eligible(self, t: _Ticket) -> bool:
+        if self._user_running[t.user] >= t.per_user:
+            return False
+        return t.fast or self._running_slow < self.slots - self.fast_slots
+
+    def _dispatch(self) -> None:
+        # Waiters cancelled before their turn (their task hasn't run its
+        # cleanup yet) must not be granted a slot nobody will release.
+        self._waiting = [t for t in self._waiting if not t.future.done()]
+        while self._running < self.slots:
+            ready = [t for t in self._waiting if self._eligible(t)]
+            if not ready:
+                break
+            t = min(ready, key=lambda x: (x.tag, x.seq))
+            self._waiting.remove(t)
+            self._running += 1
+            if not t.fast:
+                self._running_slow += 1
+            self._user_running[t.user] += 1
+            self._vtime = max(self._vtime, t.start)
+            t.granted = True
+            t.future.set_result(None)
+            if t.position:  # only tell jobs that were actually shown a queue position
+                self._notify(t, 0)
+        self._update_positions()
+
+    def _release(self, t: _Ticket) -> None:
+        self._running -= 1
+        if not t.fast:
+            self._running_slow -= 1
+        self._user_running[t.user] -= 1
+        if self._user_running[t.user] <= 0:
+            del self._user_running[t.user]
+        if not self._waiting and not self._running:
+            # Idle: reset virtual time so tags don't grow forever.
+            self._vtime = 0.0
+            self._guild_finish.clear()
+        self._dispatch()
+
+    def _update_positions(self) -> None:
+        for pos, t in enumerate(sorted(self._waiting, key=lambda x: (x.tag, x.seq)), start=1):
+            if t.position != pos:
+                t.position = pos
+                self._notify(t, pos)
+
+    def _notify(self, t: _Ticket, pos: int) -> None:
+        if t.on_position is None:
+            return
+        task = asyncio.ensure_future(t.on_position(pos))
+        task.add_done_callback(lambda f: f.cancelled() or f.exception())  # swallow edit errors
+
+    def stats(self) -> dict:
+        return {
+            "slots": self.slots,
+            "running": self._running,
+            "running_slow": self._running_slow,
+            "waiting": len(self._waiting),
+            "guilds_waiting": len({t.guild for t in self._waiting}),
+        }
+
+SCHEDULER = JobScheduler()
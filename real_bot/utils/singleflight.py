@@ -0,0 +1,120 @@
+# real_bot/utils/singleflight.py
+"""
+Single-flight coalescing for download jobs.
+
+When the same media is requested again while a download for it is still
+running, the later requesters join the running job instead of starting their
+own: one semaphore slot, one network transfer, one file. Each requester still
+does its own delivery; the job's files are cleaned up when the last of them
+releases its handle.
+
+    flight = await DOWNLOADS.join(key, fetch)   # fetch() -> (path, cleanup)
+    try:
+        send(flight.result)
+    finally:
+        flight.release()
+"""
+import asyncio
+
+class _Call:
+    def __init__(self, key, task):
+        self.key = key
+        self.task = task
+        self.holders = 0
+        self.requests = 0
+        self.cleaned = False
+
+class Flight:
+    """One requester's handle on a (possibly shared) job result."""
+
+    def __init__(self, group, call, leader: bool):
+        self._group = group
+        self._call = call
+        self.leader = leader
+        self.result = None
+        self._released = False
+
+    @property
+    def shared_with(self) -> int:
+        """How many requesters this job has served so far (including us)."""
+        return self._call.requests
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._group._release(self._call)
+
+class SingleFlight:
+    def __init__(self, name: str = "flight"):
+        self.name = name
+        self._calls = {}
+        self.unique_jobs = 0
+        self.coalesced = 0
+
+    async def join(self, key, fetch) -> Flight:
+        """Run `fetch()` once per key and share its result with concurrent callers.
+
+        `fetch` is an async callable returning (result, cleanup) where cleanup
+        is a callable (or None) run after every holder has released. A key of
+        None disables sharing for that call. Exceptions from fetch propagate to
+        every joiner.
+        """
+        call = self._calls.get(key) if key is not None else None
+        leader = call is None
+        if leader:
+            call = _Call(key, asyncio.create_task(fetch()))
+            call.task.add_done_callback(lambda t, c=call: self._on_done(c))
+            if key is not None:
+                self._calls[key] = call
+            self.unique_jobs += 1
+        else:
+            self.coalesced += 1
+            print(f"[DEBUG][{self.name}] Joined in-flight job {key[:12]}… ({call.requests + 1} requesters)")
+        call.holders += 1
+        call.requests += 1
+        flight = Flight(self, call, leader)
+        try:
+            # shield: one requester giving up must not cancel the shared job
+            result, _ = await asyncio.shield(call.task)
+        except BaseException:
+            flight.release()
+            raise
+        flight.result = result
+        return flight
+
+    def _on_done(self, call: _Call) -> None:
+        # Finished jobs stop accepting joiners; a later request starts fresh
+        # (and normally hits the media cache).
+        if self._calls.get(call.key) is call:
+            del self._calls[call.key]
+        if call.task.cancelled() or call.task.exception() is not None:
+            return
+        if call.holders == 0:
+            self._run_cleanup(call)
+
+    def _release(self, call: _Call) -> None:
+        call.holders -= 1
+        if call.holders == 0 and call.task.done():
+            self._run_cleanup(call)
+
+    def _run_cleanup(self, call: _Call) -> None:
+        if call.cleaned or call.task.cancelled() or call.task.exception() is not None:
+            return
+        call.cleaned = True
+        _, cleanup = call.task.result()
+        if cleanup is not None:
+            try:
+                cleanup()
+            except Exception as e:
+                print(f"[WARN][{self.name}] cleanup failed: {e!r}")
+
+    def stats(self) -> dict:
+        """Slot usage per unique media: jobs started vs. requests folded into them."""
+        return {
+            "in_flight": len(self._calls),
+            "waiting": sum(c.holders for c in self._calls.values()),
+            "unique_jobs": self.unique_jobs,
+            "coalesced": self.coalesced,
+        }
+
+DOWNLOADS = SingleFlight("Flight")
@@ -0,0 +1,187 @@
+# real_bot/utils/streaming.py
+"""
+Start the Discord upload while yt-dlp is still downloading.
+
+A StreamTap rides along as a yt-dlp progress hook. On the first progress
+report it checks whether the job can be streamed:
+
+- a single file written in place (no merge, no postprocessors, nopart),
+- an exact size known from the response (`total_bytes`),
+- at most STREAM_MAX_BYTES (Discord's upload limit).
+
+If so it hands the loop a GrowingFile: a read-only view of the file on disk
+that blocks (in aiohttp's executor thread) until the downloader has written
+the next bytes. The file on disk is the buffer, so memory use stays at one
+read chunk however large the media is, and discord.py's retry path can still
+seek back to the start. GrowingFilePayload tells aiohttp the final size up
+front so the multipart request keeps an exact Content-Length.
+
+Anything else (unknown size, merges, mp3 transcodes, process-pool mode) just
+isn't streamed: the job finishes into its temp file as before and the cog
+uploads that.
+"""
+import io
+import os
+import asyncio
+import threading
+
+import discord
+from aiohttp import payload as aiohttp_payload
+
+STREAM_MAX_BYTES = int(os.getenv("STREAM_MAX_BYTES", str(25 * 1024 * 1024)))  # 0 disables streaming
+STREAM_STALL_TIMEOUT = float(os.getenv("STREAM_STALL_TIMEOUT", "60"))
+
+class GrowingFile(io.RawIOBase):
+    """Reads a file that another thread is still writing, up to `total` bytes."""
+
+    def __init__(self, path: str, total: int):
+        super().__init__()
+        self.name = path
+        self.total = total
+        self._fp = open(path, "rb")
+        self._cond = threading.Condition()
+        self._done = False
+        self._error = None
+
+    # --- writer side (download thread) ---
+    def notify(self) -> None:
+        with self._cond:
+            self._cond.notify_all()
+
+    def finish(self, error=None) -> None:
+        with self._cond:
+            if not self._done:
+                self._done = True
+                self._error = error
+            self._cond.notify_all()
+
+    # --- reader side (aiohttp executor thread) ---
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._fp.tell()
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        return self._fp.seek(offset, whence)
+
+    def read(self, size: int = -1) -> bytes:
+        remaining = self.total - self._fp.tell()
+        if remaining <= 0:
+            return b""
+        if size is None or size < 0 or size > remaining:
+            size = remaining
+        while True:
+            data = self._fp.read(size)
+            if data:
+                return data
+            with self._cond:
+                if self._error is not None:
+                    raise OSError(f"download failed while streaming: {self._error}")
+                if self._done:
+                    data = self._fp.read(size)
+                    if not data:
+                        raise OSError(f"download ended at {self._fp.tell()} of {self.total} bytes")
+                    return data
+                if not self._cond.wait(STREAM_STALL_TIMEOUT):
+                    raise OSError(f"download stalled for {STREAM_STALL_TIMEOUT:.0f}s while streaming")
+
+    def readinto(self, b) -> int:
+        data = self.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
+    def close(self) -> None:
+        try:
+            self._fp.close()
+        finally:
+            super().close()
+
+class GrowingFilePayload(aiohttp_payload.IOBasePayload):
+    """IOBasePayload whose size is the announced total, not what's on disk yet."""
+
+    @property
+    def size(self):
+        if self._start_position is None:
+            self._start_position = self._value.tell()
+        return self._value.total - self._start_position
+
+aiohttp_payload.PAYLOAD_REGISTRY.register(GrowingFilePayload, GrowingFile, order=aiohttp_payload.Order.try_first)
+
+class StreamTap:
+    """yt-dlp progress hook that offers the download as a GrowingFile once it's safe to."""
+
+    def __init__(self, max_bytes: int = STREAM_MAX_BYTES, allow_dash: bool = False):
+        self.loop = asyncio.get_running_loop()
+        self.ready = self.loop.create_future()  # -> GrowingFile, or None if not streamable
+        self.max_bytes = max_bytes
+        # DASH files get fixed up after download; fine when the reader re-encodes anyway
+        self.allow_dash = allow_dash
+        self.file = None
+        self._decided = False
+
+    def _offer(self, value) -> None:
+        self._decided = True
+        self.loop.call_soon_threadsafe(lambda: self.ready.done() or self.ready.set_result(value))
+
+    def _streamable(self, d: dict) -> bool:
+        info = d.get("info_dict") or {}
+        total = d.get("total_bytes")
+        return (
+            bool(total) and total <= self.max_bytes
+            and not info.get("requested_formats")            # separate video+audio → merge
+            and (self.allow_dash or not str(info.get("container") or "").endswith("_dash"))  # fixed up after download
+            and d.get("tmpfilename", d.get("filename")) == d.get("filename")  # nopart
+            and d.get("filename") and os.path.exists(d["filename"])
+        )
+
+    def hook(self, d: dict) -> None:
+        """progress_hooks entry; runs in the download thread."""
+        status = d.get("status")
+        if not self._decided and status in ("downloading", "finished"):
+            if self._streamable(d):
+                try:
+                    self.file = GrowingFile(d["filename"], d["total_bytes"])
+                except OSError:
+                    self.file = None
+            self._offer(self.file)
+        if self.file is not None:
+            if status == "finished":
+                self.file.finish()
+            elif status == "error":
+                self.file.finish(error="yt-dlp reported an error")
+            else:
+                self.file.notify()
+
+    def close(self, error=None) -> None:
+        """Called once the download call returns or raises."""
+        if not self._decided:
+            self._offer(None)
+        if self.file is not None:
+            self.file.finish(error)
+
+async def send_while_downloading(tap: StreamTap, job, send) -> bool:
+    """Upload the tap's GrowingFile with `send(fp)` as soon as it's offered.
+
+    `job` is the task for the whole download; if it completes before the tap
+    offers anything, nothing is streamed. Returns True once the streamed
+    upload went through, False when the caller should upload the finished
+    file itself. discord.Forbidden (DMs closed) propagates like a normal send.
+    """
+    await asyncio.wait({tap.ready, job}, return_when=asyncio.FIRST_COMPLETED)
+    if not tap.ready.done() or tap.ready.result() is None:
+        return False
+    fp = tap.ready.result()
+    try:
+        await send(fp)
+        return True
+    except discord.Forbidden:
+        raise
+    except Exception as e:
+        print(f"[WARN][Stream] streamed upload failed, will send the finished file: {e!r}")
+        return False
+    finally:
+        GrowingFile.close(fp)  # discord.File swaps out fp.close; call ours directly
@@ -0,0 +1,138 @@
+# real_bot/utils/transfer.py
+"""
+Parallel transfer settings for yt-dlp downloads, tuned per platform.
+
+One TCP stream is often the bottleneck (YouTube paces single connections,
+DASH Shorts come in many small fragments), so a job may use several
+connections:
+
+- fragmented formats (DASH/HLS): `concurrent_fragment_downloads`;
+- progressive HTTP files: split into byte ranges by aria2c when it's
+  installed (yt-dlp's native HTTP downloader is single-connection), else
+  YouTube gets `http_chunk_size` ranged requests, which at least dodge
+  per-connection throttling.
+
+Connections per job come from DL_CONNECTIONS_<PLATFORM> (DL_CONNECTIONS for
+anything else) and are drawn from a per-host budget of DL_MAX_CONN_PER_HOST,
+so a burst of jobs against one CDN can't open 4 x N sockets: a job gets what
+is left (maybe fewer than it wanted) or waits for a connection to free up.
+The host is the
+platform's CDN (youtube, instagram, …): the exact format host isn't known
+until yt-dlp has picked a format.
+"""
+import os
+import shutil
+import asyncio
+from collections import defaultdict, deque
+from contextlib import asynccontextmanager
+
+DL_CONNECTIONS = int(os.getenv("DL_CONNECTIONS", "1"))
+PLATFORM_CONNECTIONS = {
+    "youtube": int(os.getenv("DL_CONNECTIONS_YOUTUBE", "4")),
+    "instagram": int(os.getenv("DL_CONNECTIONS_INSTAGRAM", "1")),  # quick to rate-limit
+}
+DL_MAX_CONN_PER_HOST = int(os.getenv("DL_MAX_CONN_PER_HOST", "8"))
+DL_RANGE_MIN_SPLIT = os.getenv("DL_RANGE_MIN_SPLIT", "1M")  # aria2c won't split below this
+YOUTUBE_CHUNK_SIZE = 10 * 1024 * 1024
+
+# yt-dlp params this module sets per job (read at download time, so a pooled
+# YoutubeDL can take them without being rebuilt)
+TRANSFER_OPTS = ("concurrent_fragment_downloads", "external_downloader", "external_downloader_args", "http_chunk_size")
+
+ARIA2C = shutil.which("aria2c")
+
+def platform_of(info: dict) -> str:
+    return (info.get("extractor_key") or info.get("extractor") or "generic").split(":")[0].lower()
+
+class ConnectionBudget:
+    """Connections in use per host, never more than `per_host` (event loop only).
+
+    take() grants up to `want` of what's free, at least one; when none is,
+    the job waits its turn (FIFO per host) until someone gives some back.
+    """
+
+    def __init__(self, per_host: int = DL_MAX_CONN_PER_HOST):
+        self.per_host = max(1, per_host)
+        self._used = defaultdict(int)
+        self._waiting = {}  # host -> deque of (want, future)
+
+    async def take(self, host: str, want: int) -> int:
+        want = max(1, want)
+        if host not in self._waiting and self._used[host] < self.per_host:
+            return self._grant(host, want)
+        fut = asyncio.get_running_loop().create_future()
+        self._waiting.setdefault(host, deque()).append((want, fut))
+        try:
+            return await fut
+        except BaseException:
+            if fut.done() and not fut.cancelled():
+                self.give(host, fut.result())  # granted just as we were cancelled
+            else:
+                queue = self._waiting.get(host)
+                if queue and (want, fut) in queue:
+                    queue.remove((want, fut))
+                self._dispatch(host)
+            raise
+
+    def give(self, host: str, n: int) -> None:
+        self._used[host] -= n
+        if self._used[host] <= 0:
+            del self._used[host]
+        self._dispatch(host)
+
+    def _grant(self, host: str, want: int) -> int:
+        n = min(want, self.per_host - self._used[host])
+        self._used[host] += n
+        return n
+
+    def _dispatch(self, host: str) -> None:
+        queue = self._waiting.get(host)
+        while queue and self._used[host] < self.per_host:
+            want, fut = queue.popleft()
+            if not fut.done():  # skip waiters cancelled before their turn
+                fut.set_result(self._grant(host, want))
+        if not queue:
+            self._waiting.pop(host, None)
+        if not self._used[host]:
+            del self._used[host]
+
+    def stats(self) -> dict:
+        return dict(self._used)
+
+CONNECTIONS = ConnectionBudget()
+
+@asynccontextmanager
+async def parallel_opts(opts: dict, info: dict, streaming: bool = False):
+    """Yield (opts with parallel settings, connections used) for one download.
+
+    Waits for a connection when the platform's budget is used up.
+
+    `streaming` keeps the file written front to back (no aria2c: it
+    preallocates and fills ranges out of order).
+    """
+    platform = platform_of(info)
+    want = PLATFORM_CONNECTIONS.get(platform, DL_CONNECTIONS)
+    n = await CONNECTIONS.take(platform, want)
+    try:
+        out = dict(opts)
+        if n > 1:
+            out["concurrent_fragment_downloads"] = n
+            if ARIA2C and not streaming and not opts.get("external_downloader"):
+                out["external_downloader"] = {"http": "aria2c"}
+                out["external_downloader_args"] = {
+                    "aria2c": ["-x", str(n), "-s", str(n), "-k", DL_RANGE_MIN_SPLIT, "--summary-interval=0"],
+                }
+        if platform == "youtube" and "external_downloader" not in out:
+            out.setdefault("http_chunk_size", YOUTUBE_CHUNK_SIZE)
+        yield out, n
+    finally:
+        CONNECTIONS.give(platform, n)
+
+def describe(opts: dict, n: int) -> str:
+    """Short label of the transfer mode, for the per-job timing line."""
+    if "external_downloader" in opts:
+        return f"{n} conn, aria2c ranges"
+    label = f"up to {n} conn (fragments)" if n > 1 else "1 conn"
+    if "http_chunk_size" in opts:
+        label += ", chunked"
+    return label
@@ -0,0 +1,17 @@
+import io
+
+from PIL import Image
+
+from real_bot.utils.avatar_cache import prepare_avatar
+
+def test_circle_keeps_avatar_transparency():
+    src = Image.new("RGBA", (256, 256), (255, 0, 0, 0))  # transparent background
+    src.paste((0, 255, 0, 255), (64, 64, 192, 192))
+    data = io.BytesIO()
+    src.save(data, "PNG")
+
+    avatar = prepare_avatar(data.getvalue())
+    w, h = avatar.size
+    assert avatar.getpixel((w // 2, h // 2))[3] == 255  # opaque inside stays opaque
+    assert avatar.getpixel((w // 2, 8))[3] == 0  # transparent inside the circle stays so
+    assert avatar.getpixel((0, 0))[3] == 0  # outside the circle
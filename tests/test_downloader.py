@@ -0,0 +1,54 @@
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from real_bot.utils.downloader import QuietLogger, YdlPool
+
+class _Clip(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "4")
+        self.send_header("Content-Type", "video/mp4")
+        self.end_headers()
+        self.wfile.write(b"clip")
+
+    def log_message(self, *args):
+        pass
+
+def _info(url, vid):
+    return {"id": vid, "title": vid, "url": url, "ext": "mp4", "extractor": "generic",
+            "extractor_key": "Generic", "webpage_url": url}
+
+def test_borrowed_instance_keeps_no_job_state(tmp_path):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Clip)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/clip.mp4"
+    pool = YdlPool()
+    seen = {"a": [], "b": []}
+    try:
+        ydls = []
+        for job in ("a", "b"):
+            job_dir = tmp_path / job
+            job_dir.mkdir()
+            logger = QuietLogger()
+            opts = {
+                "quiet": True,
+                "logger": logger,
+                "outtmpl": str(job_dir / "%(id)s.%(ext)s"),
+                "progress_hooks": [lambda d, job=job: seen[job].append(d["status"])],
+                "postprocessor_hooks": [lambda d, job=job: seen[job].append(d["postprocessor"])],
+            }
+            with pool.borrow(opts) as ydl:
+                ydls.append(ydl)
+                assert ydl.params["logger"] is logger  # same class, still this job's one
+                ydl.process_ie_result(_info(url, job), download=True)
+            assert os.listdir(job_dir) == [f"{job}.mp4"]
+
+        assert ydls[0] is ydls[1]
+        assert pool.stats()["reused"] == 1
+        # Each job saw only its own events, once each
+        assert seen["a"] == seen["b"], seen
+        assert "finished" in seen["a"] and "MoveFiles" in seen["a"]
+    finally:
+        server.shutdown()
+        pool.clear()
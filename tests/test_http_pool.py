@@ -0,0 +1,62 @@
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import yt_dlp
+from yt_dlp.networking import Request
+
+from real_bot.utils import http_pool
+
+class _Ok(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+def test_dns_cache_scoped_to_ytdlp_transport():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Ok)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    real = socket.getaddrinfo
+    try:
+        http_pool.install()
+        assert socket.getaddrinfo is real  # the rest of the process resolves normally
+
+        before = http_pool.stats()
+        url = f"http://localhost:{server.server_port}/"
+        for _ in range(2):
+            # a fresh instance each time, like a new option profile
+            with yt_dlp.YoutubeDL({"quiet": True}) as ydl:
+                with ydl.urlopen(Request(url, headers={"Connection": "close"})) as res:
+                    assert res.read() == b"ok"
+        after = http_pool.stats()
+        assert after["dns_misses"] - before["dns_misses"] <= 1
+        assert after["dns_hits"] - before["dns_hits"] >= 1
+    finally:
+        server.shutdown()
+
+def test_close_all_closes_shared_pools():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Ok)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/"
+    try:
+        http_pool.install()
+        with yt_dlp.YoutubeDL({"quiet": True}) as ydl:
+            with ydl.urlopen(Request(url)) as res:
+                assert res.read() == b"ok"
+        adapters = list(http_pool._adapters.values())
+        assert any(a.poolmanager.pools for a in adapters)  # ydl.close() left the shared pools open
+
+        http_pool.close_all()
+        assert not any(a.poolmanager.pools for a in adapters)
+        assert http_pool.stats()["hosts"] == 0
+        with yt_dlp.YoutubeDL({"quiet": True}) as ydl:  # a later job gets a new pool
+            with ydl.urlopen(Request(url)) as res:
+                assert res.read() == b"ok"
+    finally:
+        server.shutdown()
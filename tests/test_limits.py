@@ -0,0 +1,45 @@
+import pytest
+import yt_dlp
+
+from real_bot.utils.limits import EXACT_HEADROOM, TooLarge, check_fits, fit_format
+
+LIMIT = 10 * 1024 * 1024
+
+def _fmt(fid, **size):
+    return {"format_id": fid, "url": f"https://example.invalid/{fid}", "ext": "mp4",
+            "vcodec": "avc1", "acodec": "mp4a", **size}
+
+def _select(selector, formats):
+    """Format id yt-dlp picks for `selector` from `formats`, or None if nothing matches."""
+    info = {"id": "x", "title": "x", "extractor": "generic", "extractor_key": "Generic",
+            "webpage_url": "https://example.invalid/", "formats": formats}
+    with yt_dlp.YoutubeDL({"format": selector, "quiet": True, "simulate": True}) as ydl:
+        try:
+            return ydl.process_ie_result(info, download=False)["format_id"]
+        except (yt_dlp.utils.DownloadError, yt_dlp.utils.ExtractorError):
+            return None
+
+def test_unknown_size_still_selected():
+    formats = [_fmt("nosize")]
+    check_fits({"formats": formats}, LIMIT, "best")  # might fit: not rejected up front
+    assert _select(fit_format("best", LIMIT), formats) == "nosize"
+
+def test_known_fitting_size_preferred_over_unknown():
+    formats = [_fmt("nosize"), _fmt("small", filesize=LIMIT // 2)]
+    assert _select(fit_format("best", LIMIT), formats) == "small"
+
+def test_known_too_large_never_selected():
+    formats = [_fmt("huge", filesize=LIMIT * 3), _fmt("approx", filesize_approx=LIMIT * 2)]
+    assert _select(fit_format("best", LIMIT), formats) is None
+
+def test_exact_size_bound():
+    formats = [_fmt("edge", filesize=LIMIT - EXACT_HEADROOM + 1)]
+    assert _select(fit_format("best", LIMIT), formats) is None
+
+def test_formats_the_selector_skips_do_not_count():
+    # A small video-only stream fits, but "best" needs audio and video in one file
+    formats = [_fmt("video", vcodec="avc1", acodec="none", filesize=LIMIT // 4),
+               _fmt("full", filesize=LIMIT * 2)]
+    with pytest.raises(TooLarge):
+        check_fits({"formats": formats}, LIMIT, "best")
+    check_fits({"formats": formats}, LIMIT, "bestvideo")
@@ -0,0 +1,44 @@
+import asyncio
+import os
+
+from real_bot.utils.media_cache import MediaCache
+
+def _src(tmp_path, name, size):
+    path = tmp_path / name
+    path.write_bytes(b"x" * size)
+    return str(path)
+
+def test_pinned_entry_survives_eviction(tmp_path):
+    cache = MediaCache(tmp_path / "cache", budget=150)
+    first = cache.publish("a", _src(tmp_path, "a.mp4", 100))
+    cache.release(first)
+
+    held = cache.lookup("a")  # being delivered
+    assert held == first
+    second = cache.publish("b", _src(tmp_path, "b.mp4", 100))
+    assert os.path.exists(held)  # over budget, but still pinned
+
+    cache.release(held)
+    assert not os.path.exists(held)  # evicted once delivery is done
+    assert os.path.exists(second)
+    assert cache.stats()["bytes"] == 100
+
+def test_release_ignores_uncached_paths(tmp_path):
+    cache = MediaCache(tmp_path / "cache", budget=50)
+    src = _src(tmp_path, "big.mp4", 100)
+    assert cache.publish("big", src) == src  # can never fit: served from src
+    cache.release(src)
+    cache.release(None)
+
+def test_release_on_loop_evicts_in_a_thread(tmp_path):
+    cache = MediaCache(tmp_path / "cache", budget=150)
+    held = cache.publish("a", _src(tmp_path, "a.mp4", 100))
+    cache.publish("b", _src(tmp_path, "b.mp4", 100))
+
+    async def main():
+        cache.release(held)  # from the loop: the delete goes to the default executor
+        assert cache.stats()["bytes"] == 100
+        await asyncio.get_running_loop().shutdown_default_executor()
+
+    asyncio.run(main())
+    assert not os.path.exists(held)
@@ -0,0 +1,40 @@
+import asyncio
+import types
+
+from real_bot.utils import progress
+from real_bot.utils.progress import StatusEditor, watch
+
+class _Message:
+    def __init__(self, channel_id):
+        self.channel = types.SimpleNamespace(id=channel_id)
+        self.edits = []
+
+    async def edit(self, content):
+        self.edits.append(content)
+
+def test_unkeyed_jobs_do_not_share_progress():
+    async def main():
+        a, b = _Message(1), _Message(1)
+        with watch(None, StatusEditor(a, "a", interval=0)), watch(None, StatusEditor(b, "b", interval=0)):
+            progress._publish(None, "postprocessing", "Merger")
+            await asyncio.sleep(0)
+        assert not a.edits and not b.edits
+        assert None not in progress._watchers
+
+    asyncio.run(main())
+
+def test_channel_spacing_entries_are_pruned(monkeypatch):
+    monkeypatch.setattr(progress, "PROGRESS_CHANNEL_SPACING", 0.01)
+
+    async def main():
+        for channel in range(5):
+            editor = StatusEditor(_Message(channel), "x", interval=0)
+            editor.set("y")
+            await editor._task
+        await asyncio.sleep(0.02)
+        editor = StatusEditor(_Message(99), "x", interval=0)
+        editor.set("y")
+        await editor._task
+        assert list(progress._channel_next) == [99]
+
+    asyncio.run(main())
@@ -0,0 +1,79 @@
+import asyncio
+
+from real_bot.utils.scheduler import JobScheduler
+
+async def _hold(sched, user, started, release):
+    async with sched.slot(1, user, 10):
+        started.set()
+        await release.wait()
+
+def test_cancel_waiter_after_slot_frees():
+    async def main():
+        sched = JobScheduler(slots=1, per_user=1, fast_slots=0)
+        holder = sched.slot(1, 1, 10)
+        await holder.__aenter__()
+
+        waiter = asyncio.create_task(_hold(sched, 2, asyncio.Event(), asyncio.Event()))
+        await asyncio.sleep(0)
+        assert sched.stats()["waiting"] == 1
+
+        # The waiter is cancelled, and the slot frees in the same tick,
+        # before the waiter gets to run its cleanup
+        waiter.cancel()
+        await holder.__aexit__(None, None, None)  # must not raise InvalidStateError
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            pass
+        assert sched.stats()["running"] == 0
+        assert sched.stats()["waiting"] == 0
+
+        # The slot is usable again
+        started, done = asyncio.Event(), asyncio.Event()
+        done.set()
+        await asyncio.wait_for(_hold(sched, 3, started, done), 1)
+        assert started.is_set()
+
+    asyncio.run(main())
+
+def test_cancel_after_grant_releases_slot():
+    async def main():
+        sched = JobScheduler(slots=1, per_user=1, fast_slots=0)
+        started, release = asyncio.Event(), asyncio.Event()
+        holder = asyncio.create_task(_hold(sched, 1, started, release))
+        await started.wait()
+        waiter = asyncio.create_task(_hold(sched, 2, asyncio.Event(), asyncio.Event()))
+        await asyncio.sleep(0)
+
+        # Slot is handed to the waiter, which is cancelled before it wakes
+        release.set()
+        await holder
+        assert sched.stats()["running"] == 1
+        waiter.cancel()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            pass
+        assert sched.stats()["running"] == 0
+
+    asyncio.run(main())
+
+def test_cancel_while_queued():
+    async def main():
+        sched = JobScheduler(slots=1, per_user=1, fast_slots=0)
+        started, release = asyncio.Event(), asyncio.Event()
+        holder = asyncio.create_task(_hold(sched, 1, started, release))
+        await started.wait()
+        waiter = asyncio.create_task(_hold(sched, 2, asyncio.Event(), asyncio.Event()))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            pass
+        assert sched.stats()["waiting"] == 0
+        release.set()
+        await holder
+        assert sched.stats()["running"] == 0
+
+    asyncio.run(main())
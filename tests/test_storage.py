@@ -0,0 +1,15 @@
+from real_bot.storage import JsonStore
+
+def test_bad_journal_records_are_skipped(tmp_path):
+    store = JsonStore(tmp_path / "guilds.json")
+    store.ensure()
+    store.journal_path.write_bytes(
+        b'{"op": "set", "g": 1, "c": 10}\n'
+        b'{"op": "set", "g": 2}\n'          # well-formed, no channel
+        b'{"op": "del"}\n'                  # well-formed, no guild
+        b'not json\n'
+        b'{"op": "set", "g": 3, "c": 30}\n'
+        b'{"op": "set", "g": 4, "c"'        # torn tail
+    )
+    assert store.load_raw() == {"1": {"channel_id": 10}, "3": {"channel_id": 30}}
+    assert store.journal_path.read_bytes().endswith(b'"c": 30}\n')
@@ -0,0 +1,25 @@
+import asyncio
+
+from real_bot.utils.transfer import ConnectionBudget
+
+def test_budget_waits_instead_of_going_over_the_cap():
+    async def main():
+        budget = ConnectionBudget(per_host=4)
+        assert await budget.take("youtube", 4) == 4
+        waiter = asyncio.create_task(budget.take("youtube", 4))
+        cancelled = asyncio.create_task(budget.take("youtube", 1))
+        await asyncio.sleep(0)
+        assert not waiter.done()  # all 4 in use: nothing over-granted
+        assert await budget.take("instagram", 1) == 1  # other hosts unaffected
+
+        cancelled.cancel()
+        budget.give("youtube", 2)
+        assert await waiter == 2  # what's free, not what it wanted
+        assert budget.stats() == {"youtube": 4, "instagram": 1}
+
+        budget.give("youtube", 2)
+        budget.give("youtube", 2)
+        budget.give("instagram", 1)
+        assert budget.stats() == {}
+
+    asyncio.run(main())